@@ -26,7 +26,7 @@ if [ -z "$TMUX" ]; then
 fi
 
 # Check dependencies
-if ! "$PYTHON" -c "import fastapi, uvicorn" 2>/dev/null; then
+if ! "$PYTHON" -c "import fastapi, uvicorn, websockets" 2>/dev/null; then
     echo "Error: Missing Python dependencies. Run:"
     echo "  pip3 install -r requirements.txt"
     exit 1
@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
 """Mobile web terminal for remote tmux control."""
+import difflib
+import gzip
+import hashlib
+import itertools
 import json
 import os
 import re
@@ -8,17 +12,54 @@ import subprocess
 import sys
 import time
 import asyncio
+import collections
+import select
+import threading
+import urllib.parse
 import urllib.request
 from datetime import datetime
+from enum import Enum
 from pathlib import Path
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse as _JSONResponse, Response, StreamingResponse
 import uvicorn
 
+try:
+    import orjson  # optional — 3-10x faster on the string-heavy output/dashboard payloads
+except ImportError:
+    orjson = None
+try:
+    import brotli  # optional — precompressed br variants of the page shell and assets
+except ImportError:
+    brotli = None
+
 app = FastAPI()
+# JSON bodies (output, dashboard, windows) shrink ~4x. The shell and static assets
+# are precompressed and carry Content-Encoding already, and SSE is excluded by type,
+# so the middleware leaves both alone. Level 5: a poll every second can't afford 9.
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
+
+class JSONResponse(_JSONResponse):
+    """JSONResponse rendered with orjson when it's installed (stdlib json otherwise)."""
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _json_text(obj) -> str:
+    """json.dumps counterpart of JSONResponse, for WebSocket text frames."""
+    if orjson is None:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 SESSION = os.environ.get("TMUX_SESSION", "mobile")
 WORK_DIR = os.environ.get("TMUX_WORK_DIR", str(Path.home()))
+_DEFAULT_CWD = WORK_DIR if Path(WORK_DIR).is_dir() else str(Path.home())  # WORK_DIR, checked once
 _current_session = SESSION  # Mutable — can be switched at runtime
 TITLE = os.environ.get("TERMINAL_TITLE", "Mobile Terminal")
 HOST = os.environ.get("HOST", "127.0.0.1")
@@ -448,19 +489,172 @@ def _refresh_gauge_cache():
 
 ANSI_RE = re.compile(
     r'\x1b\[[0-9;]*[a-zA-Z]'
-    r'|\x1b\][^\x07]*\x07'
+    r'|\x1b\][^\x07\x1b]*\x07'   # OSC: stop at the next ESC so unterminated ones can't go quadratic
     r'|\x1b\([A-Z]'
     r'|\x1b[>=]'
     r'|\x0f'
 )
+# C0 controls except \t \n \r, plus DEL. A precompiled regex, not str.translate:
+# CC output is never pure ASCII, and translate's per-char dict lookups on non-ASCII
+# text run ~6x slower than this scan.
+CTRL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+# Same set for str.translate — ~4x faster than CTRL_RE, but only on pure-ASCII text
+# (plain shell panes); str.isascii() is a flag check, so picking costs nothing
+CTRL_TABLE = dict.fromkeys([*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f])
 
 
 TMUX_TIMEOUT = 5  # seconds — prevents requests from hanging if tmux is unresponsive
+# Resolved once: an absolute path skips the PATH search on every spawn and lets
+# subprocess use posix_spawn (it needs a path with a directory and close_fds=False)
+TMUX_BIN = shutil.which("tmux") or "tmux"
+
+
+# tmux control mode — one long-lived `tmux -C` client carries tmux commands
+# instead of a fork/exec per call. Each command's reply is framed by
+# %begin/%end (or %error) with flags=1; everything else on the stream
+# (the attach's own block, %session-changed, ...) is notification noise.
+# Any failure drops the connection and that call falls back to a subprocess.
+_tmux_ctl = None             # Popen of the control client, or None
+_tmux_ctl_lock = threading.Lock()
+_tmux_ctl_lines = collections.deque()  # complete lines read but not yet consumed
+_tmux_ctl_partial = b""      # trailing bytes of an incomplete line
+_tmux_ctl_retry_at = 0       # epoch — don't reconnect before this after a failed connect
+TMUX_CTL_RETRY = 5           # seconds
+
+
+def _tmux_ctl_quote(arg: str) -> str:
+    """Quote one argument for a control-mode command line.
+    A bare ";" stays unquoted so it keeps separating chained commands."""
+    if arg == ";":
+        return arg
+    out = []
+    for ch in arg:
+        if ch in '"\\$':
+            out.append("\\" + ch)
+        elif ch == "\n":
+            out.append("\\n")
+        elif ch == "\t":
+            out.append("\\t")
+        elif ch < " " or ch == "\x7f":
+            out.append("\\%03o" % ord(ch))
+        else:
+            out.append(ch)
+    return '"' + "".join(out) + '"'
+
+
+def _tmux_ctl_close():
+    global _tmux_ctl, _tmux_ctl_partial
+    proc, _tmux_ctl = _tmux_ctl, None
+    _tmux_ctl_lines.clear()
+    _tmux_ctl_partial = b""
+    if proc is not None:
+        try:
+            proc.kill()
+            proc.wait(timeout=1)
+        except Exception:
+            pass
+
+
+def _tmux_ctl_connect() -> bool:
+    global _tmux_ctl, _tmux_ctl_retry_at
+    if _tmux_ctl is not None and _tmux_ctl.poll() is None:
+        return True
+    _tmux_ctl_close()
+    if time.time() < _tmux_ctl_retry_at:
+        return False
+    try:
+        # no-output: we never want %output traffic; ignore-size: don't resize windows
+        _tmux_ctl = subprocess.Popen(
+            [TMUX_BIN, "-C", "attach-session", "-f", "no-output,ignore-size"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        return True
+    except Exception:
+        _tmux_ctl = None
+        _tmux_ctl_retry_at = time.time() + TMUX_CTL_RETRY
+        return False
+
+
+def _tmux_ctl_readline(deadline: float) -> bytes:
+    global _tmux_ctl_partial
+    fd = _tmux_ctl.stdout.fileno()
+    while not _tmux_ctl_lines:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0 or not select.select([fd], [], [], timeout)[0]:
+            raise TimeoutError
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            raise EOFError
+        parts = (_tmux_ctl_partial + chunk).split(b"\n")
+        _tmux_ctl_partial = parts.pop()
+        _tmux_ctl_lines.extend(parts)
+    return _tmux_ctl_lines.popleft()
+
+
+def _tmux_ctl_run(args: list, timeout: float):
+    """Run one tmux command line (possibly ";"-chained) over the control client.
+    Returns (returncode, stdout bytes, stderr bytes), or None if the command
+    never reached tmux and should be retried as a subprocess."""
+    global _tmux_ctl_retry_at
+    if not _tmux_ctl_lock.acquire(timeout=timeout):
+        return None
+    try:
+        if not _tmux_ctl_connect():
+            return None
+        expected = args.count(";") + 1
+        deadline = time.monotonic() + timeout
+        out, err = [], []
+        started = False
+        try:
+            _tmux_ctl.stdin.write((" ".join(map(_tmux_ctl_quote, args)) + "\n").encode())
+            _tmux_ctl.stdin.flush()
+            while expected:
+                line = _tmux_ctl_readline(deadline)
+                if not line.startswith(b"%begin ") or not line.endswith(b" 1"):
+                    continue  # notification or someone else's block
+                started = True
+                end = b"%end" + line[6:]
+                error = b"%error" + line[6:]
+                body = []
+                while True:
+                    line = _tmux_ctl_readline(deadline)
+                    if line == end or line == error:
+                        break
+                    body.append(line + b"\n")
+                if line == error:
+                    err.extend(body)
+                    return 1, b"".join(out), b"".join(err)  # tmux stops the chain here
+                out.extend(body)
+                expected -= 1
+        except (OSError, EOFError, TimeoutError, ValueError):
+            _tmux_ctl_close()
+            if not started:
+                # Attach refused (no server yet?) — don't respawn it on every call
+                _tmux_ctl_retry_at = time.time() + TMUX_CTL_RETRY
+                return None
+            return 1, b"".join(out), b"timeout"
+        return 0, b"".join(out), b""
+    finally:
+        _tmux_ctl_lock.release()
 
 
 def _run(cmd, **kwargs):
-    """Run a subprocess with a default timeout."""
+    """Run a command with a default timeout. tmux commands go over the
+    control-mode connection; stdin input or a broken connection use a subprocess."""
     kwargs.setdefault('timeout', TMUX_TIMEOUT)
+    if cmd[0] == "tmux" and "input" not in kwargs:
+        res = _tmux_ctl_run(cmd[1:], kwargs["timeout"])
+        if res is not None:
+            code, out, err = res
+            if kwargs.get("text"):
+                out = out.decode(errors="replace")
+                err = err.decode(errors="replace")
+            return subprocess.CompletedProcess(cmd, returncode=code, stdout=out, stderr=err)
+    if cmd[0] == "tmux":
+        # Our fds are non-inheritable (PEP 446), so there's nothing for close_fds
+        # to close — skipping it saves a walk over every open socket per spawn
+        cmd = [TMUX_BIN, *cmd[1:]]
+        kwargs.setdefault("close_fds", False)
     try:
         return subprocess.run(cmd, **kwargs)
     except subprocess.TimeoutExpired:
@@ -475,6 +669,7 @@ DIM_SPAN_RE = re.compile(
     r'(?=\x1b\[0m|\x1b\[[0-9;]*[^m]|\Z)',  # until reset or new sequence
     re.DOTALL
 )
+GHOST_DIM_RE = re.compile(r'\x1b\[0?;?2m[^\x1b]*')  # \e[2m / \e[0;2m and the dim text up to the next escape
 REVERSE_CHAR_RE = re.compile(
     r'\x1b\[7m'                 # SGR reverse video (cursor char)
     r'(.)'                       # single cursor character
@@ -488,7 +683,7 @@ def strip_ghost_text(text: str) -> str:
     Must be called BEFORE stripping ANSI codes."""
     # Remove dim/faint spans (ghost suggestion text after cursor)
     # Pattern: \e[0;2m...text...\e[0m  or  \e[2m...text...\e[0m
-    text = re.sub(r'\x1b\[0?;?2m[^\x1b]*', '', text)
+    text = GHOST_DIM_RE.sub('', text)
     # Remove reverse-video cursor char — it's the first char of the ghost suggestion
     text = REVERSE_CHAR_RE.sub('', text)
     return text
@@ -496,20 +691,41 @@ def strip_ghost_text(text: str) -> str:
 
 def clean_terminal_text(text: str) -> str:
     """Strip ANSI escapes and control characters from terminal output."""
-    text = strip_ghost_text(text)
-    text = ANSI_RE.sub("", text)
-    text = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f]', '', text)
-    return text
+    # No ESC, no escape sequences (a lone SI is a C0 control — CTRL_RE gets it)
+    if "\x1b" in text:
+        text = strip_ghost_text(text)
+        text = ANSI_RE.sub("", text)
+    return text.translate(CTRL_TABLE) if text.isascii() else CTRL_RE.sub("", text)
+
+
+def _trim_blank_lines(text: str) -> str:
+    """Drop leading and trailing whitespace-only lines, in slices rather than per-line pops.
+    The first kept line keeps its indentation."""
+    first = len(text) - len(text.lstrip())
+    if first == len(text):
+        return ""
+    start = text.rfind("\n", 0, first) + 1
+    end = text.find("\n", len(text.rstrip()))
+    return text[start:] if end < 0 else text[start:end]
+
+
+_session_checked = 0     # epoch of the last ensure_session that found/created the session
+SESSION_CHECK_TTL = 30   # seconds — page loads within this skip the has-session check
 
 
 def ensure_session():
+    global _session_checked, _tmux_ctl_retry_at
     r = _run(["tmux", "has-session", "-t", _current_session], capture_output=True)
     if r.returncode != 0:
-        work_dir = WORK_DIR if Path(WORK_DIR).is_dir() else str(Path.home())
-        _run([
+        r = _run([
             "tmux", "new-session", "-d", "-s", _current_session,
-            "-x", "80", "-y", "50", "-c", work_dir,
+            "-x", "80", "-y", "50", "-c", _DEFAULT_CWD,
         ])
+        if r.returncode == 0:
+            # A server with no sessions refuses control clients — now there's one to attach to
+            _tmux_ctl_retry_at = 0
+    if r.returncode == 0:
+        _session_checked = time.time()
 
 
 def _tmux_target(session=None, window=None):
@@ -520,9 +736,31 @@ def _tmux_target(session=None, window=None):
     return s
 
 
+_paste_seq = itertools.count()  # unique paste-buffer names across concurrent sends
+_send_locks = {}  # target → [lock held for a whole send, senders holding or waiting on it]
+_send_locks_guard = threading.Lock()
+
+
 def send_keys(text: str, session=None, window=None) -> bool:
     """Send text to tmux pane. Returns True on success, False on failure."""
     target = _tmux_target(session, window)
+    # One send at a time per pane: two concurrent Escape/C-u/paste/Enter sequences
+    # would interleave into one garbled input line.
+    with _send_locks_guard:
+        entry = _send_locks.setdefault(target, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            return _send_text(target, text)
+    finally:
+        # Targets come from clients — drop the lock once no send needs it
+        with _send_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _send_locks[target]
+
+
+def _send_text(target: str, text: str) -> bool:
     # Slash commands (/exit, /clear, etc.) must be TYPED not pasted for CC's TUI
     # to recognize them. send-keys -l sends literal keystrokes, which is reliable
     # for short single-line strings. paste-buffer inserts text as a paste event,
@@ -543,44 +781,86 @@ def send_keys(text: str, session=None, window=None) -> bool:
     # send-keys -l is unreliable for large text: special chars ($, \, `, ")
     # can be interpreted by tmux.
     # -p enables bracketed paste so TUI apps (CC) treat multiline text as a single paste.
-    buf_name = "_mt_paste"
-    r = _run(["tmux", "load-buffer", "-b", buf_name, "-"], input=text.encode())
-    if r.returncode != 0:
-        return False  # Don't send Enter if buffer load failed
+    # Load and paste are chained in one tmux invocation; a failed load stops the chain.
+    # load-buffer reads stdin asynchronously, so another client's commands can run
+    # between load and paste — a per-send buffer name keeps concurrent sends
+    # (two tabs, the bot bridge) from pasting each other's text.
+    buf_name = f"_mt_paste_{next(_paste_seq)}"
     is_multiline = "\n" in text
-    paste_cmd = ["tmux", "paste-buffer", "-d", "-b", buf_name, "-t", target]
+    paste_cmd = ["tmux", "load-buffer", "-b", buf_name, "-", ";",
+                 "paste-buffer", "-d", "-b", buf_name, "-t", target]
     if is_multiline:
-        paste_cmd.insert(3, "-p")  # Bracketed paste only for multiline
-    r = _run(paste_cmd)
+        paste_cmd.insert(7, "-p")  # Bracketed paste only for multiline
+    r = _run(paste_cmd, input=text.encode())
     if r.returncode != 0:
-        return False
+        _run(["tmux", "delete-buffer", "-b", buf_name])  # paste -d never ran
+        return False  # Don't send Enter if buffer load or paste failed
     time.sleep(0.05)  # Let TUI process paste before sending Enter
     _run(["tmux", "send-keys", "-t", target, "Enter"])
     return True
 
 
+class SpecialKey(str, Enum):
+    """tmux key names accepted by /api/key/{key}."""
+    C_c = "C-c"
+    C_d = "C-d"
+    C_l = "C-l"
+    C_z = "C-z"
+    Up = "Up"
+    Down = "Down"
+    Left = "Left"
+    Right = "Right"
+    Tab = "Tab"
+    Enter = "Enter"
+    Escape = "Escape"
+
+
 def send_special(key: str, session=None, window=None):
     target = _tmux_target(session, window)
     _run(["tmux", "send-keys", "-t", target, key])
 
 
+# Differential capture — a cheap display-message probe decides whether the pane
+# changed since the last capture-pane. history_size/cursor catch scrolling and
+# typing; window_activity (1s resolution) catches in-place redraws like CC's TUI.
+_capture_cache = {}    # target → (probe, captured_at, text)
+CAPTURE_MAX_AGE = 10   # seconds — recapture anyway, for changes tmux doesn't count as activity
+_CAPTURE_PROBE = "#{pane_id} #{pane_width}x#{pane_height} #{history_size} #{cursor_x},#{cursor_y} #{window_activity}"
+
+
 def get_output(session=None, window=None) -> str:
     target = _tmux_target(session, window)
+    p = _run(["tmux", "display-message", "-p", "-t", target, _CAPTURE_PROBE],
+             capture_output=True, text=True)
+    probe = p.stdout.strip() if p.returncode == 0 else None
+    now = time.time()
+    cached = _capture_cache.get(target)
+    if probe and cached and cached[0] == probe and now - cached[1] < CAPTURE_MAX_AGE:
+        # Same shape and no activity since the second the cached capture started
+        try:
+            if int(probe.rsplit(" ", 1)[1]) < int(cached[1]):
+                return cached[2]
+        except ValueError:
+            pass
     r = _run(
         ["tmux", "capture-pane", "-t", target, "-e", "-p", "-S", "-200"],
         capture_output=True, text=True,
     )
-    text = clean_terminal_text(r.stdout)
-    lines = text.split("\n")
-    while lines and not lines[0].strip():
-        lines.pop(0)
-    while lines and not lines[-1].strip():
-        lines.pop()
-    return "\n".join(lines)
+    text = _trim_blank_lines(clean_terminal_text(r.stdout))
+    if probe:
+        # Targets come from clients: drop entries too old to reuse. list() because
+        # other executor threads may store captures meanwhile.
+        for key, cached in list(_capture_cache.items()):
+            if now - cached[1] >= CAPTURE_MAX_AGE:
+                _capture_cache.pop(key, None)
+        _capture_cache[target] = (probe, now, text)
+    return text
 
 
 def get_pane_preview(session: str, window: int, lines: int = 5) -> str:
-    """Capture last N lines from a specific pane for preview."""
+    """Capture last N lines from a specific pane for preview.
+    Keeps -e so strip_ghost_text can drop CC's ghost suggestion: previews are
+    served as-is in /api/dashboard's "preview" field."""
     target = f"{session}:{window}"
     r = _run(
         ["tmux", "capture-pane", "-t", target, "-e", "-p", "-S", f"-{lines}"],
@@ -589,11 +869,71 @@ def get_pane_preview(session: str, window: int, lines: int = 5) -> str:
     return clean_terminal_text(r.stdout).strip()
 
 
+_PREVIEW_SEP = f"--mobile-terminal-preview-{os.getpid()}--"
+
+
+def get_pane_previews(windows: list, lines: int = 5) -> list:
+    """get_pane_preview for many (session, window) pairs in one tmux command
+    line: the captures are ";"-chained, each followed by a separator line."""
+    if not windows:
+        return []
+    cmd = ["tmux"]
+    for session, window in windows:
+        cmd += ["capture-pane", "-t", f"{session}:{window}", "-e", "-p", "-S", f"-{lines}", ";",
+                "display-message", "-p", _PREVIEW_SEP, ";"]
+    r = _run(cmd[:-1], capture_output=True, text=True)
+    chunks = r.stdout.split(_PREVIEW_SEP + "\n")
+    # tmux stops the chain at the first failed capture (window closed meanwhile) —
+    # everything from there on is captured one by one
+    done = len(chunks) - 1
+    return ([clean_terminal_text(c).strip() for c in chunks[:done]]
+            + [get_pane_preview(session, window, lines) for session, window in windows[done:]])
+
+
+CC_BANNER_RE = re.compile(r'Claude Code v\d')
+CC_CONTEXT_RE = re.compile(r'Context left[^:]*:\s*(\d+)%')
+CC_PERM_RE = re.compile(r'\u23f5\u23f5\s+(.+?)(?:\s*\(shift\+tab|\s*\u00b7)')
+CC_PERM_FALLBACK_RE = re.compile(r'\u23f5\u23f5\s+(.+?)(?:\s*\u00b7|$)')
+
+
+_preview_cache = {}  # pane_id → (probe, captured_at, preview) — dashboard previews
+
+
+def _dashboard_previews(rows: list, now: float) -> list:
+    """Previews for get_dashboard's list-panes rows (one per pane, so cached by
+    pane_id). A pane whose probe (the trailing list-panes fields) is unchanged and
+    whose window saw no activity since its last capture reuses that preview; the
+    rest are captured in one batch."""
+    global _preview_cache
+    cache, previews, stale = {}, [], []
+    for i, parts in enumerate(rows):
+        key = parts[8]
+        probe = "\t".join(parts[7:])
+        cached = _preview_cache.get(key)
+        try:
+            fresh = (cached is not None and cached[0] == probe and now - cached[1] < CAPTURE_MAX_AGE
+                     and int(parts[7]) < int(cached[1]))
+        except ValueError:
+            fresh = False
+        if fresh:
+            cache[key] = cached
+            previews.append(cached[2])
+        else:
+            stale.append(i)
+            previews.append("")
+    captured = get_pane_previews([(rows[i][0], int(rows[i][1])) for i in stale], lines=40)
+    for i, preview in zip(stale, captured):
+        previews[i] = preview
+        cache[rows[i][8]] = ("\t".join(rows[i][7:]), now, preview)
+    _preview_cache = cache  # rebuilt each call, so closed panes drop out
+    return previews
+
+
 def detect_cc_status(text: str) -> dict:
     """Detect if text is Claude Code output and its status.
     Returns dict with is_cc, status, context_pct, perm_mode.
     """
-    is_cc = '\u276f' in text and ('\u23fa' in text or bool(re.search(r'Claude Code v\d', text)))
+    is_cc = '\u276f' in text and ('\u23fa' in text or bool(CC_BANNER_RE.search(text)))
     if not is_cc:
         return {"is_cc": False, "status": None, "context_pct": None, "perm_mode": None, "fresh": False}
 
@@ -612,23 +952,22 @@ def detect_cc_status(text: str) -> dict:
             if 'esc to interrupt' in line:
                 has_working = True
             # Context remaining: "Context left until auto-compact: 9%"
-            m = re.search(r'Context left[^:]*:\s*(\d+)%', line)
+            m = CC_CONTEXT_RE.search(line)
             if m:
                 context_pct = int(m.group(1))
             # Permission mode: text between ⏵⏵ and (shift+tab or first ·
-            pm = re.search(r'\u23f5\u23f5\s+(.+?)(?:\s*\(shift\+tab|\s*\u00b7)', line)
+            pm = CC_PERM_RE.search(line)
             if pm:
                 perm_mode = pm.group(1).strip()
             elif '\u23f5\u23f5' in line:
                 # Fallback: grab everything after ⏵⏵ up to first ·
-                pm2 = re.search(r'\u23f5\u23f5\s+(.+?)(?:\s*\u00b7|$)', line)
+                pm2 = CC_PERM_FALLBACK_RE.search(line)
                 if pm2:
                     perm_mode = pm2.group(1).strip()
             break
 
     # 2. Thinking: · at START of any line in last 15 lines
-    tail = '\n'.join(lines[-15:])
-    has_thinking = bool(re.search(r'^\u00b7', tail, re.MULTILINE))
+    has_thinking = any(line.startswith('\u00b7') for line in lines[-15:])
 
     # --- Determine status ---
     # Only rely on text signals (status bar + thinking indicator).
@@ -645,31 +984,46 @@ def detect_cc_status(text: str) -> dict:
     return {"is_cc": True, "status": status, "context_pct": context_pct, "perm_mode": perm_mode, "fresh": fresh}
 
 
+def _attached_sessions() -> set:
+    """Names of sessions with a real client attached. Not #{session_attached}:
+    that also counts our own control-mode connection."""
+    r = _run(
+        ["tmux", "list-clients", "-F", "#{client_control_mode}\t#{client_session}"],
+        capture_output=True, text=True,
+    )
+    return {line[2:] for line in r.stdout.split("\n") if line.startswith("0\t")}
+
+
+# list-panes fields for get_dashboard, unit-separated: names and paths can hold
+# tabs, \x1f they can't (tmux passes it through untouched). The last five form
+# the preview probe in _dashboard_previews.
+_DASHBOARD_FIELDS = 12
+_DASHBOARD_FORMAT = "\x1f".join([
+    "#{session_name}", "#{window_index}", "#{window_name}", "#{pane_current_path}",
+    "#{pane_current_command}", "#{window_active}", "#{pane_pid}", "#{window_activity}",
+    "#{pane_id}", "#{pane_width}x#{pane_height}", "#{history_size}", "#{cursor_x},#{cursor_y}",
+])
+
+
 def get_dashboard() -> dict:
     """Get lightweight status for all sessions and windows."""
     now = time.time()
     # Single call to get all pane metadata including activity timestamp
-    r = _run(
-        ["tmux", "list-panes", "-a", "-F",
-         "#{session_name}\t#{window_index}\t#{window_name}\t#{pane_current_path}\t#{pane_current_command}\t#{window_active}\t#{session_attached}\t#{pane_pid}\t#{window_activity}"],
-        capture_output=True, text=True,
-    )
+    r = _run(["tmux", "list-panes", "-a", "-F", _DASHBOARD_FORMAT], capture_output=True, text=True)
+    attached = _attached_sessions()
+    # No .strip(): str.strip() counts \x1f as whitespace
+    rows = [parts for parts in (line.split("\x1f") for line in r.stdout.split("\n"))
+            if len(parts) == _DASHBOARD_FIELDS]
+    # Preview for CC detection (40 lines) — only windows that changed are recaptured
+    previews = _dashboard_previews(rows, now)
     sessions = {}
-    for line in r.stdout.strip().split("\n"):
-        if not line:
-            continue
-        parts = line.split("\t")
-        if len(parts) < 9:
-            continue
-        sname, widx, wname, cwd, cmd, wactive, sattached, pid, wactivity = parts
+    for (sname, widx, wname, cwd, cmd, wactive, pid, wactivity, *_), preview in zip(rows, previews):
         if sname not in sessions:
             sessions[sname] = {
                 "name": sname,
-                "attached": sattached == "1",
+                "attached": sname in attached,
                 "windows": [],
             }
-        # Get preview for CC detection (40 lines)
-        preview = get_pane_preview(sname, int(widx), lines=40)
         cc = detect_cc_status(preview)
         # Always provide tmux window_activity as baseline fallback.
         # Client prefers gauge_last_ts (JSONL) when available.
@@ -723,60 +1077,75 @@ def get_dashboard() -> dict:
 def list_sessions() -> list:
     """List all tmux sessions with their windows."""
     r = _run(
-        ["tmux", "list-sessions", "-F", "#{session_name} #{session_windows} #{session_attached}"],
+        ["tmux", "list-sessions", "-F", "#{session_name}"],
         capture_output=True, text=True,
     )
+    # Every session's windows in one list-windows -a rather than a call per session;
+    # \x1f-separated so window names with spaces survive
+    wr = _run(
+        ["tmux", "list-windows", "-a", "-F",
+         "#{session_name}\x1f#{window_index}\x1f#{window_name}\x1f#{window_active}"],
+        capture_output=True, text=True,
+    )
+    by_session = {}
+    for wline in wr.stdout.split("\n"):
+        wp = wline.split("\x1f")
+        if len(wp) != 4:
+            continue
+        by_session.setdefault(wp[0], []).append({
+            "index": int(wp[1]),
+            "name": wp[2],
+            "active": wp[3] == "1",
+        })
+    attached = _attached_sessions()
     sessions = []
     for line in r.stdout.strip().split("\n"):
         if not line:
             continue
-        parts = line.split(" ", 2)
-        name = parts[0]
-        # Get windows for this session
-        wr = _run(
-            ["tmux", "list-windows", "-t", name, "-F", "#{window_index} #{window_name} #{window_active}"],
-            capture_output=True, text=True,
-        )
-        windows = []
-        for wline in wr.stdout.strip().split("\n"):
-            if not wline:
-                continue
-            wp = wline.split(" ", 2)
-            windows.append({
-                "index": int(wp[0]),
-                "name": wp[1] if len(wp) > 1 else "",
-                "active": wp[2] == "1" if len(wp) > 2 else False,
-            })
+        name = line
         sessions.append({
             "name": name,
-            "windows": windows,
-            "attached": parts[2] == "1" if len(parts) > 2 else False,
+            "windows": by_session.get(name, []),
+            "attached": name in attached,
         })
     return sessions
 
 
+_windows_cache = None  # (session, epoch, windows) — cleared by the window-mutating routes
+_WINDOWS_TTL = 2       # seconds — windows also change from inside tmux (new/kill/rename there)
+
+
+def _invalidate_windows():
+    global _windows_cache, _dashboard_cache, _dashboard_gen
+    _windows_cache = None
+    _dashboard_cache = None
+    _dashboard_gen += 1  # a build already in flight predates the change — don't cache it
+
+
 def list_windows() -> list:
+    global _windows_cache
+    cached = _windows_cache
+    if cached and cached[0] == _current_session and time.time() - cached[1] < _WINDOWS_TTL:
+        return cached[2]
+    session = _current_session
+    # Tab-separated: window names may contain spaces
     r = _run(
-        ["tmux", "list-windows", "-t", _current_session, "-F", "#{window_index} #{window_name} #{window_active}"],
+        ["tmux", "list-windows", "-t", session, "-F", "#{window_index}\t#{window_active}\t#{window_name}"],
         capture_output=True, text=True,
     )
-    windows = []
-    for line in r.stdout.strip().split("\n"):
-        if not line:
-            continue
-        parts = line.split(" ", 2)
-        windows.append({
-            "index": int(parts[0]),
-            "name": parts[1] if len(parts) > 1 else "",
-            "active": parts[2] == "1" if len(parts) > 2 else False,
-        })
+    windows = [
+        {"index": int(idx), "name": name, "active": active == "1"}
+        for idx, active, name in (line.split("\t", 2) for line in r.stdout.splitlines() if line)
+    ]
+    if r.returncode == 0:
+        _windows_cache = (session, time.time(), windows)
     return windows
 
 
 def new_window(session=None, cwd=None, commands=None):
     target = session or _current_session
-    work_dir = cwd or WORK_DIR
-    if not Path(work_dir).is_dir():
+    work_dir = cwd or _DEFAULT_CWD
+    if cwd and not Path(cwd).is_dir():
         work_dir = str(Path.home())
     r = _run(["tmux", "new-window", "-t", target, "-c", work_dir, "-P", "-F", "#{window_index}"],
              capture_output=True, text=True)
@@ -855,8 +1224,194 @@ async def _notification_monitor():
             await loop.run_in_executor(None, _check_pending_notifications)
 
 
+# --- Output push (WebSocket) ---
+# One capture loop per (session, window), shared by every socket watching it.
+# Each tick diffs the capture against the previous one and fans out line-level
+# splice ops, so an idle pane costs one capture per tick and zero bytes on the wire.
+OUTPUT_PUSH_INTERVAL = 0.25  # seconds — an unchanged pane costs one display-message probe per tick
+_output_subs = {}   # (session, window) → set of asyncio.Queue
+_output_tasks = {}  # (session, window) → asyncio.Task running _output_pump
+_output_last = {}   # (session, window) → [str] — lines of the last capture
+_output_inflight = {}  # (session, window) → Future of a get_output already running for HTTP pollers
+_output_cache = {}  # (session, window) → (monotonic time, text) of the last capture made for HTTP pollers
+OUTPUT_CACHE_TTL = 0.4  # seconds — pollers of one pane (split view, several browsers) share a capture
+_output_recent = collections.OrderedDict()  # (session, window) → OrderedDict etag → [str] sent to HTTP pollers; LRU
+OUTPUT_RECENT_MAX = 4  # per pane — enough for a few clients at different versions
+OUTPUT_RECENT_PANES = 32  # targets come from clients — keep only the most recently polled
+
+
+def _diff_lines(old: list, new: list) -> list:
+    """Line-level diff as splice ops [i1, i2, [lines]]: replace old[i1:i2] with lines.
+    Ops are in ascending order — apply them back-to-front so indices stay valid."""
+    sm = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    return [[i1, i2, new[j1:j2]] for tag, i1, i2, j1, j2 in sm.get_opcodes() if tag != "equal"]
+
+
+async def _output_pump(target):
+    """Capture a pane on a fixed tick and push diffs to its subscribers."""
+    loop = asyncio.get_running_loop()
+    session, window = target
+    try:
+        while _output_subs.get(target):
+            try:
+                text = await loop.run_in_executor(None, get_output, session, window)
+                lines = text.split("\n")
+                prev = _output_last.get(target)
+                if lines != prev:
+                    _output_last[target] = lines
+                    msg = {"full": text} if prev is None else {"ops": _diff_lines(prev, lines)}
+                    for q in _output_subs.get(target, ()):
+                        q.put_nowait(msg)
+            except Exception:
+                pass  # e.g. tmux restarting — keep the subscribers and retry next tick
+            await asyncio.sleep(OUTPUT_PUSH_INTERVAL)
+    finally:
+        _output_tasks.pop(target, None)
+        _output_last.pop(target, None)
+
+
+def _output_etag(output: str) -> str:
+    return '"' + hashlib.blake2b(output.encode(), digest_size=16).hexdigest() + '"'
+
+
+async def _output_snapshot(session, window) -> str:
+    """Current text of a pane. Reuses the push loop's snapshot when one is
+    running; otherwise pollers of a pane share one capture per OUTPUT_CACHE_TTL."""
+    target = (session or _current_session, window)
+    last = _output_last.get(target)
+    if last is not None:
+        return "\n".join(last)
+    cached = _output_cache.get(target)
+    if cached is not None and time.monotonic() - cached[0] < OUTPUT_CACHE_TTL:
+        return cached[1]
+    fut = _output_inflight.get(target)
+    if fut is None:
+        loop = asyncio.get_running_loop()
+        fut = _output_inflight[target] = loop.run_in_executor(None, get_output, session, window)
+
+        def _store(f):
+            # Not ours any more: _invalidate_output dropped it, so the capture may predate a send
+            if _output_inflight.get(target) is not f:
+                return
+            del _output_inflight[target]
+            if not f.cancelled() and f.exception() is None:
+                now = time.monotonic()
+                # Targets come from clients: drop expired entries so the cache only holds live pollers
+                for k in [k for k, v in _output_cache.items() if now - v[0] >= OUTPUT_CACHE_TTL]:
+                    del _output_cache[k]
+                _output_cache[target] = (now, f.result())
+        fut.add_done_callback(_store)
+    # shield: one poller disconnecting mustn't cancel the capture the others await
+    return await asyncio.shield(fut)
+
+
+def _invalidate_output(target):
+    """Forget a pane's cached and in-flight capture after input was sent to it."""
+    _output_cache.pop(target, None)
+    _output_inflight.pop(target, None)
+
+
+class _TaggedQueue:
+    """Subscriber for one pane on a multiplexed socket: forwards the pump's
+    messages into the connection's queue, tagged with the client's id."""
+    def __init__(self, q: asyncio.Queue, sub_id):
+        self.q, self.sub_id = q, sub_id
+
+    def put_nowait(self, msg):
+        self.q.put_nowait({"id": self.sub_id, **msg})
+
+
+def _output_subscribe(target, q=None) -> asyncio.Queue:
+    q = q or asyncio.Queue()
+    _output_subs.setdefault(target, set()).add(q)
+    last = _output_last.get(target)
+    if last is not None:
+        # Late joiner: start from the current snapshot, then follow the shared diffs
+        q.put_nowait({"full": "\n".join(last)})
+    if target not in _output_tasks:
+        _output_tasks[target] = asyncio.create_task(_output_pump(target))
+    return q
+
+
+def _output_unsubscribe(target, q):
+    subs = _output_subs.get(target)
+    if subs is not None:
+        subs.discard(q)
+        if not subs:
+            _output_subs.pop(target, None)  # pump exits on its next tick
+
+
+# Dashboard push: one shared loop runs get_dashboard for every /ws/dashboard client
+# and sends the serialized payload only when it differs from the last one.
+_dashboard_subs = set()   # asyncio.Queue per connected client
+_dashboard_task = None    # asyncio.Task running _dashboard_pump
+_dashboard_last = None    # JSON text of the last payload pushed
+DASHBOARD_PUSH_INTERVAL = 2  # seconds — unchanged windows cost no capture (see _dashboard_previews)
+_dashboard_cache = None     # (monotonic time, JSON text) of the last build made for HTTP pollers
+_dashboard_inflight = None  # (generation, Future of the JSON text) of a build already running for HTTP pollers
+_dashboard_gen = 0          # bumped by _invalidate_windows; builds from an older generation aren't cached
+DASHBOARD_CACHE_TTL = 1.5   # seconds
+
+
+async def _dashboard_pump():
+    global _dashboard_task, _dashboard_last
+    loop = asyncio.get_running_loop()
+    try:
+        while _dashboard_subs:
+            try:
+                text = _json_text(await loop.run_in_executor(None, get_dashboard))
+                if text != _dashboard_last:
+                    _dashboard_last = text
+                    for q in _dashboard_subs:
+                        q.put_nowait(text)
+            except Exception:
+                pass  # a failed build keeps the last payload; retry next tick
+            await asyncio.sleep(DASHBOARD_PUSH_INTERVAL)
+    finally:
+        _dashboard_task = None
+        _dashboard_last = None
+
+
+async def _dashboard_text() -> str:
+    """Serialized dashboard for HTTP pollers. Reuses the push loop's payload when
+    one is running; otherwise every client shares one build per DASHBOARD_CACHE_TTL."""
+    global _dashboard_inflight
+    if _dashboard_last is not None:
+        return _dashboard_last
+    if _dashboard_cache is not None and time.monotonic() - _dashboard_cache[0] < DASHBOARD_CACHE_TTL:
+        return _dashboard_cache[1]
+    inflight = _dashboard_inflight
+    if inflight is None or inflight[0] != _dashboard_gen:
+        loop = asyncio.get_running_loop()
+        gen = _dashboard_gen
+        inflight = _dashboard_inflight = (gen, loop.run_in_executor(None, lambda: _json_text(get_dashboard())))
+
+        def _store(f):
+            global _dashboard_cache, _dashboard_inflight
+            if _dashboard_inflight is not None and _dashboard_inflight[1] is f:
+                _dashboard_inflight = None
+            if gen == _dashboard_gen and not f.cancelled() and f.exception() is None:
+                _dashboard_cache = (time.monotonic(), f.result())
+        inflight[1].add_done_callback(_store)
+    # The build resolves to its own text — the cache may be cleared before we resume
+    return await asyncio.shield(inflight[1])
+
+
+def _dashboard_subscribe() -> asyncio.Queue:
+    global _dashboard_task
+    q = asyncio.Queue()
+    _dashboard_subs.add(q)
+    if _dashboard_last is not None:
+        q.put_nowait(_dashboard_last)
+    if _dashboard_task is None:
+        _dashboard_task = asyncio.create_task(_dashboard_pump())
+    return q
+
+
 @app.on_event("startup")
 async def startup_event():
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, ensure_session)
     asyncio.create_task(_notification_monitor())
 
 
@@ -1852,10 +2407,12 @@ let panes = [];         // [{ id, tabIds, activeTabId }]
 let activePaneId = null;
 let _dragSrcTabId = null;
 let allTabs = {};       // tabId -> { session, windowIndex, windowName }
-let tabStates = {};     // tabId -> { rawContent, last, rawMode, pendingMsg, pendingTime, awaitingResponse, lastOutputChange, pollInterval }
+let tabStates = {};     // tabId -> { rawContent, last, rawMode, pendingMsg, pendingTime, awaitingResponse, lastOutputChange, polling, fetchDelay, nextFetchAt, wsSub, wsLines, wsText, outEl }
 let _nextPaneId = 1;
 let _nextTabId = 1;
 let _dashboardData = null;
+let _dashboardEtag = null;   // ETag of _dashboardData — polls send If-None-Match
+let _dashWs = null, _dashWsRetryAt = 0;  // /ws/dashboard push socket
 let _sidebarCollapsed = false;
 let _sidebarExpanded = false;
 let _wdSession = null, _wdWindow = null; // window details modal context
@@ -1874,6 +2431,17 @@ const SEND_SVG = '<svg viewBox="0 0 24 24" fill="none" stroke="currentColor" str
 
 // === Utility ===
 function esc(s) { const d=document.createElement('div'); d.textContent=s; return d.innerHTML; }
+function escAttr(s) { return esc(s).replace(/"/g, '&quot;'); }
+// Run fn at most once per animation frame, with the latest call's arguments
+function rafThrottle(fn) {
+  let queued = false, args;
+  return function(...a) {
+    args = a;
+    if (queued) return;
+    queued = true;
+    requestAnimationFrame(() => { queued = false; fn(...args); });
+  };
+}
 const _tblStartRe = /^\s*\u250c[\u2500\u252c]+\u2510/m;
 const _tblEndRe = /^\s*\u2514[\u2500\u2534]+\u2518/m;
 const _tblSepRe = /^[\u250c\u251c\u2514][\u2500\u252c\u253c\u2534\u2510\u2524\u2518]+$/;
@@ -1923,7 +2491,9 @@ function renderRawWithTables(raw) {
   if (buf.length) parts.push(esc(buf.join('\\n')));
   return parts.join('');
 }
+let _markedReady = false;
 function _initMarked() {
+  if (_markedReady) return true;
   if (typeof marked === 'undefined') return false;
   const renderer = new marked.Renderer();
   renderer.link = function(href, title, text) {
@@ -1933,9 +2503,16 @@ function _initMarked() {
     return '<a href="' + h + '" target="_blank" rel="noopener noreferrer"' + (t ? ' title="' + t + '"' : '') + '>' + tx + '</a>';
   };
   marked.setOptions({ breaks: false, renderer: renderer });
+  _markedReady = true;
   return true;
 }
+// Rendered markdown by source text — every output change re-renders all turns,
+// but only the changed ones miss. Map order doubles as LRU order.
+const _mdCache = new Map();
+const MD_CACHE_MAX = 300;
 function md(s) {
+  const hit = _mdCache.get(s);
+  if (hit !== undefined) { _mdCache.delete(s); _mdCache.set(s, hit); return hit; }
   if (_initMarked()) {
     try {
       // Split into table blocks and text blocks
@@ -1965,6 +2542,8 @@ function md(s) {
         const escaped = out.join('\\n').replace(/</g, '&lt;').replace(/>/g, '&gt;');
         html += marked.parse(escaped);
       }
+      _mdCache.set(s, html);
+      if (_mdCache.size > MD_CACHE_MAX) _mdCache.delete(_mdCache.keys().next().value);
       return html;
     } catch(e) { /* fall through to plain text */ }
   }
@@ -2461,7 +3040,7 @@ function ftOpenFile(filePath, targetPaneId) {
     rawContent: '', last: '', rawMode: false,
     pendingMsg: null, pendingTime: 0,
     awaitingResponse: false, lastOutputChange: 0,
-    pollInterval: null, ccStatus: null,
+    polling: false, ccStatus: null,
     fileContent: null, fileLoaded: false, fileRawView: true,
     fileMtime: null, fileEditing: false, fileDirty: false,
     fileSaving: false, fileMtimeInterval: null,
@@ -2478,6 +3057,7 @@ function ftOpenFile(filePath, targetPaneId) {
   outEl.style.display = 'none';
   outEl.innerHTML = '<div class="turn assistant"><div class="turn-body"><p style="color:var(--text3)">Loading...</p></div></div>';
   paneEl.querySelector('.pane-input').before(outEl);
+  tabStates[id].outEl = outEl; // moves between panes with the tab, never recreated
 
   focusTab(id);
   renderPaneTabs(paneId);
@@ -2932,6 +3512,7 @@ function unhideSession(name) {
   renderSidebar();
 }
 let _hiddenExpanded = false;
+let _sidebarGen = 0; // bumped whenever renderSidebar rebuilds the session list
 
 // === Activity age formatting ===
 function formatAge(seconds) {
@@ -2957,6 +3538,12 @@ function updateSidebarAges() {
   }
 }
 
+// Status-bar / thinking patterns shared by detectCCStatus and isIdle
+const CC_STATUSBAR_RE = /^\\s*\\u23f5/;
+const CC_CONTEXT_LEFT_RE = /Context left[^:]*:\\s*(\\d+)%/;
+const CC_PERM_MODE_RE = /\\u23f5\\u23f5\\s+(.+?)(?:\\s*\\(shift\\+tab|\\s*\\u00b7)/;
+const CC_PERM_MODE_FALLBACK_RE = /\\u23f5\\u23f5\\s+(.+?)(?:\\s*\\u00b7|$)/;
+const CC_THINKING_RE = /^\\u00b7/m;
 function detectCCStatus(text) {
   // Quick client-side CC status detection from output text
   // Returns {status, contextPct, permMode, fresh} or null
@@ -2966,22 +3553,22 @@ function detectCCStatus(text) {
   let status = 'idle', contextPct = null, permMode = null;
   // Check status bar (last line with ⏵) for "esc to interrupt", context %, and perm mode
   for (let i = lines.length - 1; i >= Math.max(0, lines.length - 5); i--) {
-    if (/^\\s*\\u23f5/.test(lines[i])) {
-      if (/esc to interrupt/.test(lines[i])) status = 'working';
-      const m = lines[i].match(/Context left[^:]*:\\s*(\\d+)%/);
+    if (CC_STATUSBAR_RE.test(lines[i])) {
+      if (lines[i].includes('esc to interrupt')) status = 'working';
+      const m = lines[i].match(CC_CONTEXT_LEFT_RE);
       if (m) contextPct = parseInt(m[1]);
       // Extract permission mode: text between ⏵⏵ and (shift+tab or first ·
-      const pm = lines[i].match(/\\u23f5\\u23f5\\s+(.+?)(?:\\s*\\(shift\\+tab|\\s*\\u00b7)/);
+      const pm = lines[i].match(CC_PERM_MODE_RE);
       if (pm) permMode = pm[1].trim();
       else {
-        const pm2 = lines[i].match(/\\u23f5\\u23f5\\s+(.+?)(?:\\s*\\u00b7|$)/);
+        const pm2 = lines[i].match(CC_PERM_MODE_FALLBACK_RE);
         if (pm2) permMode = pm2[1].trim();
       }
       break;
     }
   }
   // Check for thinking indicator
-  if (status === 'idle' && /^\\u00b7/m.test(lines.slice(-15).join('\\n'))) status = 'thinking';
+  if (status === 'idle' && CC_THINKING_RE.test(lines.slice(-15).join('\\n'))) status = 'thinking';
   return { status, contextPct, permMode, fresh };
 }
 function updateSidebarStatus(session, windowIndex, ccStatus, contextPct, permMode) {
@@ -3010,7 +3597,16 @@ function updateSidebarStatus(session, windowIndex, ccStatus, contextPct, permMod
 }
 
 // === Clean/parse (unchanged core logic) ===
+const CT_ROUND_BORDER_RE = /^\\s*[\\u256d\\u2570\\u251c][\\u2500\\u2504\\u2501]+[\\u256e\\u256f\\u2524]\\s*$/;
+const CT_BAR_LEAD_RE = /^\\s*\\u2502\\s?/;
+const CT_BAR_TRAIL_RE = /\\s?\\u2502\\s*$/;
+const CT_BOX_CHAR_RE = /[\\u2500-\\u257f]/g;
+const CT_SPINNER_RE = /[\\u280b\\u2819\\u2839\\u2838\\u283c\\u2834\\u2826\\u2827\\u2807\\u280f]/g;
+const CT_BOX_ANY_RE = /[\\u2500-\\u257f]/;
 function cleanTerminal(raw) {
+  // No box-drawing anywhere (plain shell output): the line pass below would keep
+  // every line unchanged, so go straight to the whole-text replaces
+  if (!CT_BOX_ANY_RE.test(raw)) return raw.replace(CT_SPINNER_RE, '').replace(/\\n{3,}/g, '\\n\\n').trim();
   let lines = raw.split('\\n');
   // Mark lines inside box-drawing tables (┌...┘) — protect from TUI chrome stripping
   const inTbl = new Array(lines.length).fill(false);
@@ -3025,48 +3621,62 @@ function cleanTerminal(raw) {
     if (inTbl[i]) { result.push(lines[i]); continue; }
     const l = lines[i];
     // Remove rounded border lines: ╭───╮, ╰───╯, ├───┤
-    if (/^\\s*[\\u256d\\u2570\\u251c][\\u2500\\u2504\\u2501]+[\\u256e\\u256f\\u2524]\\s*$/.test(l)) continue;
+    if (CT_ROUND_BORDER_RE.test(l)) continue;
     // Strip │ borders from line start/end
-    let cleaned = l.replace(/^\\s*\\u2502\\s?/, '').replace(/\\s?\\u2502\\s*$/, '');
+    let cleaned = l.replace(CT_BAR_LEAD_RE, '').replace(CT_BAR_TRAIL_RE, '');
     // Remove TUI divider lines: pure box-drawing or labeled dividers
     const t = cleaned.trim();
-    if (t) { const bc = (t.match(/[\\u2500-\\u257f]/g) || []).length; if (bc > 20 && bc > t.length * 0.6) continue; }
+    if (t) { const bc = (t.match(CT_BOX_CHAR_RE) || []).length; if (bc > 20 && bc > t.length * 0.6) continue; }
     result.push(cleaned);
   }
   let text = result.join('\\n');
-  text = text.replace(/[\\u280b\\u2819\\u2839\\u2838\\u283c\\u2834\\u2826\\u2827\\u2807\\u280f]/g, '');
+  text = text.replace(CT_SPINNER_RE, '');
   text = text.replace(/\\n{3,}/g, '\\n\\n');
   return text.trim();
 }
-function isClaudeCode(text) { return /\\u276f/.test(text) && (/\\u23fa/.test(text) || /Claude Code v\\d/.test(text)); }
+function isClaudeCode(text) { return text.includes('\\u276f') && (text.includes('\\u23fa') || CC_BANNER_RE.test(text)); }
 function isIdle(text) {
   const lines = text.split('\\n');
   // Check status bar (last line starting with ⏵) for "esc to interrupt"
   // Only check the status bar line, not conversation content
   for (let i = lines.length - 1; i >= Math.max(0, lines.length - 5); i--) {
-    if (/^\\s*\\u23f5/.test(lines[i])) {
-      if (/esc to interrupt/.test(lines[i])) return false;
+    if (CC_STATUSBAR_RE.test(lines[i])) {
+      if (lines[i].includes('esc to interrupt')) return false;
       break;
     }
   }
   // Check last 15 lines for thinking indicator (· at start of line)
   const tail = lines.slice(-15).join('\\n');
-  if (/^\\u00b7/m.test(tail)) return false;
+  if (CC_THINKING_RE.test(tail)) return false;
   return true;
 }
+// parseCCTurns patterns — hoisted so a 200-line pane doesn't rebuild them per line
+const CC_NBSP_RE = /\\u00a0/g;
+const CC_BANNER_RE = /Claude Code v\\d/;
+const CC_PROMPT_RE = /^\\u276f/;
+const CC_PROMPT_LEAD_RE = /^\\u276f\\s*/;
+const CC_BULLET_RE = /^\\u23fa/;
+const CC_BULLET_LEAD_RE = /^\\u23fa\\s*/;
+const CC_RESULT_RE = /^\\u23bf/;
+const CC_RULE_RE = /^[\\u2500-\\u257f]{3,}$/;
+const CC_BOX_CORNER_RE = /[\\u250c\\u2510\\u2514\\u2518\\u252c\\u253c\\u2534]/;
+const CC_SKIP_RE = /^[\\u23f5\\u2026]/;
+const CC_STATUS_RE = /^[\\u2720-\\u273f\\u00b7]/;
+const CC_TOOL_RE = /^(?:Bash|Read|Write|Update|Edit|Fetch|Search|Glob|Grep|Task|Skill|NotebookEdit|Searched for|Wrote \\d)/;
 function parseCCTurns(text) {
   // Trim to last CC session — find last startup banner ("Claude Code v")
   // and only parse from there, so old session content / shell lines are excluded
-  let lines = text.split('\\n');
+  // NBSP → space once up front; every test below wants the normalized form
+  let lines = text.replace(CC_NBSP_RE, ' ').split('\\n');
   let bannerIdx = -1;
   for (let i = lines.length - 1; i >= 0; i--) {
-    if (/Claude Code v\\d/.test(lines[i])) { bannerIdx = i; break; }
+    if (CC_BANNER_RE.test(lines[i])) { bannerIdx = i; break; }
   }
   if (bannerIdx >= 0) {
     // Find the first ❯ after the banner (skip banner block)
     let startIdx = bannerIdx;
     for (let i = bannerIdx; i < lines.length; i++) {
-      if (/^\\u276f/.test(lines[i].replace(/\\u00a0/g, ' '))) { startIdx = i; break; }
+      if (CC_PROMPT_RE.test(lines[i])) { startIdx = i; break; }
     }
     lines = lines.slice(startIdx);
   }
@@ -3074,12 +3684,10 @@ function parseCCTurns(text) {
   // Menu selection ❯ lines (plan approval, AskUserQuestion) have no ⏺ after them.
   const realPrompts = new Set();
   for (let i = 0; i < lines.length; i++) {
-    const r = lines[i].replace(/\\u00a0/g, ' ');
-    if (/^\\u276f/.test(r)) {
+    if (CC_PROMPT_RE.test(lines[i])) {
       for (let j = i + 1; j < lines.length; j++) {
-        const jr = lines[j].replace(/\\u00a0/g, ' ');
-        if (/^\\u276f/.test(jr)) break;
-        if (/^\\u23fa/.test(jr.trim())) { realPrompts.add(i); break; }
+        if (CC_PROMPT_RE.test(lines[j])) break;
+        if (CC_BULLET_RE.test(lines[j].trim())) { realPrompts.add(i); break; }
       }
     }
   }
@@ -3088,39 +3696,37 @@ function parseCCTurns(text) {
   // input (which may span multiple lines) never leaks into assistant turns.
   let lastPromptIdx = -1;
   for (let i = lines.length - 1; i >= 0; i--) {
-    if (/^\\u276f/.test(lines[i].replace(/\\u00a0/g, ' '))) { lastPromptIdx = i; break; }
+    if (CC_PROMPT_RE.test(lines[i])) { lastPromptIdx = i; break; }
   }
   if (lastPromptIdx >= 0 && !realPrompts.has(lastPromptIdx)) {
     lines = lines.slice(0, lastPromptIdx);
   }
   const turns = []; let cur = null, inTool = false, sawStatus = false;
   for (let li = 0; li < lines.length; li++) {
-    const line = lines[li];
-    const raw = line.replace(/\\u00a0/g, ' ');
+    const raw = lines[li];
     const t = raw.trim();
-    if (/^[\\u2500-\\u257f]{3,}$/.test(t) && t.length > 20 && !/[\\u250c\\u2510\\u2514\\u2518\\u252c\\u253c\\u2534]/.test(t)) continue;
-    if (/^[\\u23f5]/.test(t)) continue;
-    if (/^\\u2026/.test(t)) continue;
+    if (t.length > 20 && CC_RULE_RE.test(t) && !CC_BOX_CORNER_RE.test(t)) continue;
+    if (CC_SKIP_RE.test(t)) continue;
     if (!t) { if (cur && cur.role === 'assistant' && !inTool) cur.lines.push(''); continue; }
-    if (/^[\\u2720-\\u273f]/.test(t)) { sawStatus = true; continue; }
-    if (/^\\u00b7/.test(t)) { sawStatus = true; continue; }
-    if (/esc to interrupt/.test(t)) continue;
-    if (/^\\u276f/.test(raw) && realPrompts.has(li)) {
+    if (CC_STATUS_RE.test(t)) { sawStatus = true; continue; }
+    if (t.includes('esc to interrupt')) continue;
+    const isPrompt = CC_PROMPT_RE.test(raw);
+    if (isPrompt && realPrompts.has(li)) {
       if (cur) turns.push(cur);
-      const msg = t.replace(/^\\u276f\\s*/, '').trim();
+      const msg = t.replace(CC_PROMPT_LEAD_RE, '').trim();
       // Skip CC slash commands (/clear, /help, etc.) — they're meta, not conversation
       if (msg.startsWith('/')) { cur = null; inTool = false; sawStatus = false; continue; }
       cur = { role: 'user', lines: msg ? [msg] : [] }; inTool = false; sawStatus = false; continue;
     }
     // Non-prompt ❯ line (menu selection) — treat as regular text, strip the ❯
-    if (/^\\u276f/.test(raw) && !realPrompts.has(li)) {
-      const menuText = t.replace(/^\\u276f\\s*/, '').trim();
+    if (isPrompt) {
+      const menuText = t.replace(CC_PROMPT_LEAD_RE, '').trim();
       if (cur && !inTool && menuText) cur.lines.push(menuText);
       continue;
     }
-    if (/^\\u23fa/.test(t)) {
-      const after = t.replace(/^\\u23fa\\s*/, '');
-      if (/^(Bash|Read|Write|Update|Edit|Fetch|Search|Glob|Grep|Task|Skill|NotebookEdit|Searched for|Wrote \\d)/.test(after)) {
+    if (CC_BULLET_RE.test(t)) {
+      const after = t.replace(CC_BULLET_LEAD_RE, '');
+      if (CC_TOOL_RE.test(after)) {
         // Tool call: close current card before entering tool mode
         if (cur && cur.lines && cur.lines.some(l => l.trim())) { turns.push(cur); cur = null; }
         inTool = true;
@@ -3134,7 +3740,7 @@ function parseCCTurns(text) {
       inTool = false;
       cur.lines.push(after); continue;
     }
-    if (/^\\u23bf/.test(t)) { inTool = true; continue; }
+    if (CC_RESULT_RE.test(t)) { inTool = true; continue; }
     if (inTool) continue;
     if (cur && !inTool) {
       if (cur.role === 'assistant') cur.lines.push(t);
@@ -3149,10 +3755,28 @@ function parseCCTurns(text) {
   return filtered;
 }
 
+// Cleaned text + live CC status for a tab's raw output, recomputed only when the
+// raw text changes (applyOutput runs every tick, mostly on identical output)
+function cleanFor(state, raw) {
+  if (state._cleanSrc !== raw) {
+    state._cleanSrc = raw;
+    state._clean = cleanTerminal(raw);
+    state._live = detectCCStatus(state._clean);
+    state._turns = null;
+  }
+  return state._clean;
+}
+// Parsed CC turns for the tab's current clean text, parsed once per output change.
+// renderOutput rewrites turn.lines (pending-message scrub), so hand out copies.
+function turnsFor(state) {
+  if (!state._turns) state._turns = parseCCTurns(state._clean);
+  return state._turns.map(t => ({ role: t.role, lines: t.lines }));
+}
+
 // === Render output into target element ===
 function renderOutput(raw, targetEl, state, tabId) {
   // Process awaitingResponse/pendingMsg regardless of view mode (queue, notifications depend on this)
-  const clean = cleanTerminal(raw);
+  const clean = cleanFor(state, raw);
   const wasAwaiting = state.awaitingResponse;
   if (state.awaitingResponse) {
     const elapsed = Date.now() - state.pendingTime;
@@ -3191,13 +3815,14 @@ function renderOutput(raw, targetEl, state, tabId) {
     let display = jLines.join('\\n').replace(/\\n{4,}/g, '\\n\\n\\n');
     if (_tblStartRe.test(display)) { targetEl.innerHTML = renderRawWithTables(display); }
     else { targetEl.textContent = display; }
+    targetEl._linkKey = null; // chat view rebuilds from scratch after raw
     if (_fileLinksEnabled) linkifyFilePaths(targetEl, getTabCwd(tabId));
     return;
   }
   targetEl.className = 'pane-output chat';
-  let html = '';
+  const parts = []; // one '<div class="turn">' string per turn
   if (isClaudeCode(clean)) {
-    const turns = parseCCTurns(clean);
+    const turns = turnsFor(state);
     if (state.pendingMsg) {
       const snippet = state.pendingMsg.substring(0, 20);
       const userTurns = turns.filter(t => t.role === 'user');
@@ -3214,35 +3839,65 @@ function renderOutput(raw, targetEl, state, tabId) {
         }
       }
     }
+    // Turn HTML from the previous render, keyed by role/label/text — only the
+    // streaming tail turn normally misses, so esc()/md() skip the rest
+    const prevHtml = state._turnHtml || new Map();
+    const turnHtml = new Map();
     let lastRole = '';
     for (const t of turns) {
       const text = t.lines.join('\\n').trim();
       if (!text) continue;
-      if (t.role === 'user') {
-        html += '<div class="turn user"><div class="turn-label">You</div><div class="turn-body">' + esc(text) + '</div></div>';
-      } else {
-        const label = lastRole !== 'assistant' ? '<div class="turn-label">Claude</div>' : '';
-        // Interactive prompts (AskUserQuestion/plan approval) have ❯ in text —
-        // render as plain text with line breaks to avoid markdown list mangling
-        const body = /\\u276f/.test(text) ? esc(text).replace(/\\n/g, '<br>') : md(text);
-        html += '<div class="turn assistant">' + label + '<div class="turn-body">' + body + '</div></div>';
+      const labeled = t.role === 'user' || lastRole !== 'assistant';
+      const key = t.role + (labeled ? '+' : '-') + text;
+      let html = prevHtml.get(key);
+      if (html === undefined) {
+        if (t.role === 'user') {
+          html = '<div class="turn user"><div class="turn-label">You</div><div class="turn-body">' + esc(text) + '</div></div>';
+        } else {
+          const label = labeled ? '<div class="turn-label">Claude</div>' : '';
+          // Interactive prompts (AskUserQuestion/plan approval) have ❯ in text —
+          // render as plain text with line breaks to avoid markdown list mangling
+          const body = /\\u276f/.test(text) ? esc(text).replace(/\\n/g, '<br>') : md(text);
+          html = '<div class="turn assistant">' + label + '<div class="turn-body">' + body + '</div></div>';
+        }
       }
+      turnHtml.set(key, html);
+      parts.push(html);
       lastRole = t.role;
     }
+    state._turnHtml = turnHtml;
     if (state.pendingMsg)
-      html += '<div class="turn user"><div class="turn-label">You</div><div class="turn-body">' + esc(state.pendingMsg) + '</div></div>';
+      parts.push('<div class="turn user"><div class="turn-label">You</div><div class="turn-body">' + esc(state.pendingMsg) + '</div></div>');
     if (state.awaitingResponse || !isIdle(clean))
-      html += '<div class="turn assistant"><div class="turn-label">Claude</div><div class="turn-body"><p class="thinking">Working\\u2026</p></div></div>';
-    if (!html)
-      html = '<div class="turn assistant"><div class="turn-label">Claude</div><div class="turn-body"><p style="color:var(--text3)">Ready</p></div></div>';
+      parts.push('<div class="turn assistant"><div class="turn-label">Claude</div><div class="turn-body"><p class="thinking">Working\\u2026</p></div></div>');
+    if (!parts.length)
+      parts.push('<div class="turn assistant"><div class="turn-label">Claude</div><div class="turn-body"><p style="color:var(--text3)">Ready</p></div></div>');
   } else {
     if (clean.trim())
-      html = '<div class="turn assistant"><div class="turn-label">Terminal</div><div class="turn-body mono">' + esc(clean) + '</div></div>';
+      parts.push('<div class="turn assistant"><div class="turn-label">Terminal</div><div class="turn-body mono">' + esc(clean) + '</div></div>');
+  }
+  if (!parts.length)
+    parts.push('<div class="turn assistant"><div class="turn-label">Terminal</div><div class="turn-body"><p style="color:var(--text3)">Waiting for output...</p></div></div>');
+  patchTurns(targetEl, parts, _fileLinksEnabled ? getTabCwd(tabId) : null);
+}
+// Bring targetEl's turn nodes in line with parts, touching only turns whose HTML
+// changed — usually just the streaming last turn. Each node remembers its source
+// string; a changed link context (cwd, file-links toggle) rebuilds everything.
+function patchTurns(targetEl, parts, linkCwd) {
+  const key = linkCwd || '';
+  if (targetEl._linkKey !== key) { targetEl._linkKey = key; targetEl.textContent = ''; }
+  const kids = targetEl.children;
+  const tpl = document.createElement('template');
+  for (let i = 0; i < parts.length; i++) {
+    const cur = kids[i];
+    if (cur && cur._src === parts[i]) continue;
+    tpl.innerHTML = parts[i];
+    const node = tpl.content.firstElementChild;
+    node._src = parts[i];
+    if (cur) targetEl.replaceChild(node, cur); else targetEl.appendChild(node);
+    if (linkCwd) linkifyFilePaths(node, linkCwd);
   }
-  if (!html)
-    html = '<div class="turn assistant"><div class="turn-label">Terminal</div><div class="turn-body"><p style="color:var(--text3)">Waiting for output...</p></div></div>';
-  targetEl.innerHTML = html;
-  if (_fileLinksEnabled) linkifyFilePaths(targetEl, getTabCwd(tabId));
+  while (kids.length > parts.length) targetEl.removeChild(targetEl.lastElementChild);
 }
 
 // === Pane management ===
@@ -3288,6 +3943,14 @@ function createPane(parentEl) {
   const sendBtn = el.querySelector('.pane-send');
   setupTextareaInput(ta, () => sendToPane(id));
   sendBtn.addEventListener('click', () => sendToPane(id));
+  // Tab clicks are delegated — renderPaneTabs rebuilds the bar's HTML often
+  el.querySelector('.pane-tab-bar').addEventListener('click', e => {
+    const tab = e.target.closest('.pane-tab');
+    if (!tab) return;
+    const tid = parseInt(tab.dataset.tabId);
+    if (e.target.closest('.pane-tab-close')) closeTab(tid);
+    else focusTab(tid);
+  });
   // Click anywhere on pane to focus it
   el.addEventListener('mousedown', () => focusPane(id));
   // Drop target with vertical split detection
@@ -3412,7 +4075,7 @@ function createTab(session, windowIndex, windowName, targetPaneId) {
     rawContent: '', last: '', rawMode: true,
     pendingMsg: null, pendingTime: 0,
     awaitingResponse: false, lastOutputChange: 0,
-    pollInterval: null, ccStatus: null,
+    polling: false, ccStatus: null,
     _scrollToBottom: true,
   };
   pane.tabIds.push(id);
@@ -3428,6 +4091,7 @@ function createTab(session, windowIndex, windowName, targetPaneId) {
   outEl.innerHTML = '<div class="turn assistant"><div class="turn-label">Terminal</div>'
     + '<div class="turn-body"><p style="color:var(--text3)">Connecting...</p></div></div>';
   paneEl.querySelector('.pane-input').before(outEl);
+  tabStates[id].outEl = outEl; // moves between panes with the tab, never recreated
 
   focusTab(id);
   renderPaneTabs(paneId);
@@ -3617,19 +4281,28 @@ function moveTabToPane(tabId, targetPaneId) {
       ph.textContent = 'Open a window from the sidebar';
       srcEl.querySelector('.pane-input').before(ph);
     }
-    renderPaneTabs(sourcePaneId);
+    invalidatePaneTabs(sourcePaneId);
     showActiveTabOutput(sourcePaneId);
   }
   focusPane(targetPaneId);
-  renderPaneTabs(targetPaneId);
+  invalidatePaneTabs(targetPaneId);
   showActiveTabOutput(targetPaneId);
   updateQueueContent(targetPaneId);
-  renderSidebar();
+  invalidateSidebar();
   updatePolling();
   saveLayout();
 }
 
+// Deferred re-render for callers that may hit the same pane several times in one
+// task (dashboard renames, tab moves). A direct renderPaneTabs in between wins.
+const _paneTabsDirty = new Set();
+function invalidatePaneTabs(paneId) {
+  if (_paneTabsDirty.has(paneId)) return;
+  _paneTabsDirty.add(paneId);
+  queueMicrotask(() => { if (_paneTabsDirty.has(paneId)) renderPaneTabs(paneId); });
+}
 function renderPaneTabs(paneId) {
+  _paneTabsDirty.delete(paneId);
   const pane = panes.find(p => p.id === paneId);
   if (!pane) return;
   const paneEl = document.getElementById('pane-' + paneId);
@@ -3644,11 +4317,10 @@ function renderPaneTabs(paneId) {
     const isFile = tab.type === 'file';
     const dotClass = isFile ? 'none' : (st && st.ccStatus ? st.ccStatus : 'none');
     html += '<div class="pane-tab' + (active ? ' active' : '') + (isFile ? ' file-tab' : '') + '" draggable="true"'
-      + ' data-tab-id="' + tid + '"'
-      + ' onclick="focusTab(' + tid + ')">'
+      + ' data-tab-id="' + tid + '">'
       + '<span class="pane-tab-dot ' + dotClass + '" data-tab-dot="' + tid + '"></span>'
       + '<span class="pane-tab-name"' + (isFile ? ' title="' + esc(tab.filePath) + '"' : '') + '>' + esc(tab.windowName) + '</span>'
-      + '<span class="pane-tab-close" onclick="event.stopPropagation();closeTab(' + tid + ')">&times;</span>'
+      + '<span class="pane-tab-close">&times;</span>'
       + '</div>';
   }
   // Notepad/Queue/Refresh buttons — only for terminal tabs
@@ -4504,19 +5176,122 @@ function setupDivider(div, dir) {
 }
 
 // === Polling ===
+// Output arrives as line diffs over one WebSocket per page (/ws/outputs), with a
+// subscription per polling tab. The 1s tick stays: it re-applies the pushed text
+// (sidebar status, deferred renders) and falls back to fetching
+// /api/output/batch for tabs without a live subscription.
+// Data Saver on: stretch the fallback poll. With a live socket a tick costs no request.
+const TAB_POLL_MS = (navigator.connection && navigator.connection.saveData) ? 3000 : 1000;
+// HTTP fallback backs off while a pane sits unchanged: each unchanged response
+// stretches the wait 1.5x up to TAB_POLL_MAX_MS. Any change, send, or key resets it.
+const TAB_POLL_MAX_MS = 10000;
+function pollBackoff(state) {
+  state.fetchDelay = Math.min(TAB_POLL_MAX_MS, (state.fetchDelay || TAB_POLL_MS) * 1.5);
+  state.nextFetchAt = Date.now() + state.fetchDelay;
+}
+function pollSoon(state) { state.fetchDelay = 0; state.nextFetchAt = 0; }
 function startTabPolling(tabId) {
   const tab = allTabs[tabId];
   if (tab && tab.type === 'file') return; // No polling for file tabs
   const state = tabStates[tabId];
-  if (!state || state.pollInterval) return;
-  pollTab(tabId);
-  state.pollInterval = setInterval(() => pollTab(tabId), 1000);
+  if (!state || state.polling) return;
+  state.polling = true;
+  openTabSocket(tabId);
+  pollSoon(state);
+  schedulePoll(0);
 }
 function stopTabPolling(tabId) {
   const state = tabStates[tabId];
-  if (!state || !state.pollInterval) return;
-  clearInterval(state.pollInterval);
-  state.pollInterval = null;
+  if (!state) return;
+  closeTabSocket(state);
+  state.polling = false;
+  // Last poller gone (page hidden, tabs closed): drop the batch in flight unread
+  if (_pollAbort && !Object.values(tabStates).some(st => st.polling)) _pollAbort.abort();
+}
+// One chained timeout drives every polling tab, so due fetches share a single
+// /api/output/batch request. The next tick is armed only after this one settles.
+let _pollTimer = null, _pollRunning = false, _pollAgain = false;
+let _pollAbort = null; // AbortController of the batch fetch in flight
+function schedulePoll(delay) {
+  if (_pollRunning) { if (!delay) _pollAgain = true; return; } // re-armed when the tick ends
+  clearTimeout(_pollTimer);
+  _pollTimer = setTimeout(runPollTick, delay);
+}
+async function runPollTick() {
+  _pollTimer = null; _pollRunning = true; _pollAgain = false;
+  try {
+    await pollTabs(Object.keys(tabStates).map(Number).filter(id => tabStates[id].polling));
+  } finally {
+    _pollRunning = false;
+    if (Object.values(tabStates).some(st => st.polling)) schedulePoll(_pollAgain ? 0 : TAB_POLL_MS);
+  }
+}
+let _outWs = null, _outWsRetryAt = 0, _outSubSeq = 0;
+const _outSubs = {}; // subscription id → tabId
+function outputSocket() {
+  if (_outWs) return _outWs;
+  if (!window.WebSocket || Date.now() < _outWsRetryAt) return null;
+  const proto = location.protocol === 'https:' ? 'wss://' : 'ws://';
+  const ws = new WebSocket(proto + location.host + '/ws/outputs');
+  _outWs = ws;
+  ws.onmessage = (e) => {
+    const d = JSON.parse(e.data);
+    const tabId = _outSubs[d.id];
+    const state = tabStates[tabId];
+    if (!state) return; // Unsubscribed while the message was in flight
+    if (d.full !== undefined) state.wsLines = d.full.split('\\n');
+    else if (state.wsLines) applyLineOps(state.wsLines, d.ops);
+    else return;
+    state.wsText = state.wsLines.join('\\n');
+    state.etag = null; // state.last now follows the socket, not the last HTTP body
+    applyOutput(tabId, state.wsText);
+  };
+  ws.onclose = () => {
+    if (_outWs !== ws) return; // Closed by closeOutputSocket
+    dropOutputSubs();
+    _outWsRetryAt = Date.now() + 5000; // HTTP polling covers the gap
+  };
+  return ws;
+}
+function dropOutputSubs() {
+  _outWs = null;
+  for (const id in _outSubs) {
+    const state = tabStates[_outSubs[id]];
+    if (state) { state.wsSub = null; state.wsLines = null; state.wsText = null; }
+    delete _outSubs[id];
+  }
+}
+function closeOutputSocket() {
+  const ws = _outWs;
+  if (!ws) return;
+  dropOutputSubs();
+  ws.close();
+}
+function openTabSocket(tabId) {
+  const tab = allTabs[tabId]; const state = tabStates[tabId];
+  if (!tab || !state || state.wsSub) return;
+  const ws = outputSocket();
+  if (!ws) return;
+  const id = ++_outSubSeq;
+  state.wsSub = id; state.wsLines = null; state.wsText = null;
+  _outSubs[id] = tabId;
+  const msg = JSON.stringify({ sub: id, session: tab.session, window: tab.windowIndex });
+  if (ws.readyState === WebSocket.OPEN) ws.send(msg);
+  else ws.addEventListener('open', () => { if (_outSubs[id] === tabId) ws.send(msg); }, { once: true });
+}
+function closeTabSocket(state) {
+  const id = state.wsSub;
+  if (!id) return;
+  delete _outSubs[id];
+  state.wsSub = null; state.wsLines = null; state.wsText = null;
+  if (_outWs && _outWs.readyState === WebSocket.OPEN) _outWs.send(JSON.stringify({ unsub: id }));
+}
+function applyLineOps(lines, ops) {
+  // Splice ops [i1, i2, newLines] arrive ascending — apply back-to-front
+  for (let i = ops.length - 1; i >= 0; i--) {
+    const [i1, i2, repl] = ops[i];
+    lines.splice(i1, i2 - i1, ...repl);
+  }
 }
 async function hardRefresh(paneId) {
   const pane = panes.find(p => p.id === paneId);
@@ -4541,55 +5316,115 @@ async function hardRefresh(paneId) {
     const d = await r.json();
     state.lastOutputChange = Date.now();
     state.last = d.output; state.rawContent = d.output;
+    state.etag = r.headers.get('ETag'); // batch polls diff against the text this etag names
     const outEl = document.getElementById('tab-output-' + tabId);
     if (outEl) { renderOutput(d.output, outEl, state, tabId); outEl.scrollTop = outEl.scrollHeight; }
   } catch(e) {}
 }
 
-async function pollTab(tabId) {
-  const tab = allTabs[tabId]; const state = tabStates[tabId];
-  if (!tab || !state) return;
+async function pollTabs(ids) {
+  const due = [];
+  for (const tabId of ids) {
+    const tab = allTabs[tabId]; const state = tabStates[tabId];
+    if (!tab || !state) continue;
+    if (state.wsText != null) { applyOutput(tabId, state.wsText); continue; }
+    if (!state.wsSub) openTabSocket(tabId);
+    if (!state.awaitingResponse && Date.now() < (state.nextFetchAt || 0)) {
+      if (state.last != null) applyOutput(tabId, state.last); // deferred renders, scroll-to-bottom
+      continue;
+    }
+    due.push(tabId);
+  }
+  if (!due.length) return;
   try {
-    const r = await fetch('/api/output?session=' + encodeURIComponent(tab.session) + '&window=' + tab.windowIndex);
+    // Per-pane ETags: panes that haven't changed come back without their text,
+    // changed ones as line ops against the text that etag names
+    const bases = due.map(tabId => tabStates[tabId].last);
+    const targets = due.map(tabId => {
+      const tab = allTabs[tabId]; const state = tabStates[tabId];
+      return { session: tab.session, window: tab.windowIndex, etag: state.last != null ? state.etag : null };
+    });
+    const ctl = _pollAbort = new AbortController();
+    const r = await fetch('/api/output/batch', {
+      method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ targets }),
+      signal: ctl.signal,
+    });
+    if (!r.ok) return;
     const d = await r.json();
-    // Update sidebar status on every poll (1s latency vs 3s dashboard)
-    const clean = cleanTerminal(d.output);
-    const live = detectCCStatus(clean);
-    if (live) {
-      updateSidebarStatus(tab.session, tab.windowIndex, live.fresh ? null : live.status, live.contextPct, live.permMode);
-      const effectiveStatus = live.fresh ? null : live.status;
-      if (state.ccStatus !== effectiveStatus) {
-        state.ccStatus = effectiveStatus;
-        const dot = document.querySelector('[data-tab-dot="' + tabId + '"]');
-        if (dot) dot.className = 'pane-tab-dot ' + (effectiveStatus || 'none');
+    due.forEach((tabId, k) => {
+      const state = tabStates[tabId]; const res = d.results[k];
+      if (!state || !state.polling || !res || state.wsText != null) return; // Closed, stopped, or the socket delivered
+      let output = res.output;
+      if (res.ops !== undefined && bases[k] != null) {
+        const lines = bases[k].split('\\n');
+        applyLineOps(lines, res.ops);
+        output = lines.join('\\n');
       }
-    } else if (state.ccStatus !== null) {
-      state.ccStatus = null;
+      if (output === undefined) { pollBackoff(state); applyOutput(tabId, state.last); return; }
+      state.etag = res.etag;
+      if (output === state.last) pollBackoff(state); else pollSoon(state);
+      applyOutput(tabId, output);
+    });
+  } catch(e) {}
+  finally { _pollAbort = null; }
+}
+function applyOutput(tabId, output) {
+  const tab = allTabs[tabId]; const state = tabStates[tabId];
+  if (!tab || !state) return;
+  // Update sidebar status on every tick (1s latency vs 3s dashboard). _live is
+  // memoized per output, so the same object on the same sidebar DOM needs no lookups.
+  cleanFor(state, output);
+  const live = state._live;
+  if (live && (state._sbLive !== live || state._sbGen !== _sidebarGen)) {
+    state._sbLive = live; state._sbGen = _sidebarGen;
+    updateSidebarStatus(tab.session, tab.windowIndex, live.fresh ? null : live.status, live.contextPct, live.permMode);
+  }
+  if (live) {
+    const effectiveStatus = live.fresh ? null : live.status;
+    if (state.ccStatus !== effectiveStatus) {
+      state.ccStatus = effectiveStatus;
       const dot = document.querySelector('[data-tab-dot="' + tabId + '"]');
-      if (dot) dot.className = 'pane-tab-dot none';
-    }
-    const contentChanged = d.output !== state.last;
-    if (contentChanged) {
-      state.lastOutputChange = Date.now();
-      state.last = d.output; state.rawContent = d.output;
-    }
-    if (contentChanged || state._scrollToBottom || state._renderDeferred) {
-      // Defer heavy DOM work during drag to prevent stutter
-      if (_dragSrcTabId !== null || _sbDragging) { state._renderDeferred = true; return; }
-      const outEl = document.getElementById('tab-output-' + tabId);
-      if (!outEl) return;
-      // Skip DOM update while user is selecting text (prevents selection jumping)
-      const sel = window.getSelection();
-      if (sel && sel.type === 'Range' && outEl.contains(sel.anchorNode)) return;
-      const atBottom = state._scrollToBottom || (outEl.scrollHeight - outEl.scrollTop - outEl.clientHeight < 80);
-      if (contentChanged || state._renderDeferred) renderOutput(d.output, outEl, state, tabId);
-      if (atBottom) outEl.scrollTop = outEl.scrollHeight;
-      state._scrollToBottom = false;
-      state._renderDeferred = false;
+      if (dot) dot.className = 'pane-tab-dot ' + (effectiveStatus || 'none');
     }
-  } catch(e) {}
+  } else if (state.ccStatus !== null) {
+    state.ccStatus = null;
+    const dot = document.querySelector('[data-tab-dot="' + tabId + '"]');
+    if (dot) dot.className = 'pane-tab-dot none';
+  }
+  const contentChanged = output !== state.last;
+  if (contentChanged) {
+    state.lastOutputChange = Date.now();
+    state.last = output; state.rawContent = output;
+    state._renderDirty = true;
+  }
+  if (state._renderDirty || state._scrollToBottom || state._renderDeferred) scheduleRender(tabId);
+}
+// Socket pushes and poll ticks can land in the same frame — render once per frame
+function scheduleRender(tabId) {
+  const state = tabStates[tabId];
+  if (!state || state._renderQueued) return;
+  state._renderQueued = true;
+  requestAnimationFrame(() => { state._renderQueued = false; flushRender(tabId); });
+}
+function flushRender(tabId) {
+  const state = tabStates[tabId];
+  if (!state) return;
+  // Defer heavy DOM work during drag to prevent stutter
+  if (_dragSrcTabId !== null || _sbDragging) { state._renderDeferred = true; return; }
+  const outEl = state.outEl;
+  if (!outEl) return;
+  // Skip DOM update while user is selecting text (prevents selection jumping)
+  const sel = window.getSelection();
+  if (sel && sel.type === 'Range' && outEl.contains(sel.anchorNode)) return;
+  const atBottom = state._scrollToBottom || (outEl.scrollHeight - outEl.scrollTop - outEl.clientHeight < 80);
+  if (state._renderDirty || state._renderDeferred) renderOutput(state.last, outEl, state, tabId);
+  if (atBottom) outEl.scrollTop = outEl.scrollHeight;
+  state._renderDirty = false;
+  state._scrollToBottom = false;
+  state._renderDeferred = false;
 }
 function updatePolling() {
+  if (document.hidden) return; // visibilitychange calls back in when the page returns
   // Poll all visible tabs (active tab in each pane)
   const visibleTabs = new Set();
   for (const p of panes) { if (p.activeTabId) visibleTabs.add(p.activeTabId); }
@@ -4659,6 +5494,7 @@ async function sendGlobal() {
 async function keyActive(k) {
   const active = getActiveTab(); if (!active) return;
   if (active.tab && active.tab.type === 'file') return;
+  pollSoon(active.state);
   try { await fetch('/api/key/' + k + '?session=' + encodeURIComponent(active.tab.session) + '&window=' + active.tab.windowIndex); } catch(e) {}
 }
 
@@ -4668,6 +5504,7 @@ async function sendResumeActive() {
   const active = getActiveTab(); if (!active) return;
   if (active.tab && active.tab.type === 'file') return;
   active.state.rawMode = true;
+  pollSoon(active.state);
   document.getElementById('view-label').textContent = 'Raw';
   try {
     await fetch('/api/send', {
@@ -4829,7 +5666,14 @@ function closeMobileSidebar() {
 let _sidebarOrder = { sessions: [], windows: {} };
 let _sbDragging = false;
 
+let _sidebarDirty = false;
+function invalidateSidebar() {
+  if (_sidebarDirty) return;
+  _sidebarDirty = true;
+  queueMicrotask(() => { if (_sidebarDirty) renderSidebar(); });
+}
 function renderSidebar() {
+  _sidebarDirty = false;
   if (_sbDragging) return;
   const data = _dashboardData;
   if (!data) return;
@@ -4855,7 +5699,7 @@ function renderSidebar() {
   }
   // Hidden sessions section
   if (hiddenSessions.length > 0) {
-    html += '<div class="sb-hidden-header" onclick="_hiddenExpanded=!_hiddenExpanded;renderSidebar()">'
+    html += '<div class="sb-hidden-header">'
       + '<span class="sb-hidden-chevron' + (_hiddenExpanded ? ' open' : '') + '">&#9654;</span>'
       + ' Hidden (' + hiddenSessions.length + ')</div>';
     if (_hiddenExpanded) {
@@ -4865,9 +5709,10 @@ function renderSidebar() {
     }
   }
   content.innerHTML = html;
+  _sidebarGen++;
 }
 function renderSidebarSession(s, activeTab, isHidden) {
-  let html = '<div class="sb-session" draggable="true" data-session="' + esc(s.name) + '">';
+  let html = '<div class="sb-session" draggable="true" data-session="' + escAttr(s.name) + '">';
   const winOrder = _sidebarOrder.windows[s.name] || [];
   const windows = [...s.windows].sort((a, b) => {
     const ia = winOrder.indexOf(a.index);
@@ -4877,14 +5722,12 @@ function renderSidebarSession(s, activeTab, isHidden) {
     if (ib < 0) return -1;
     return ia - ib;
   });
-  const fsEsc = esc(s.name).replace(/'/g, "\\\\'");
   const hideBtn = isHidden
-    ? '<button class="sb-hide-btn" onclick="event.stopPropagation();unhideSession(\\'' + fsEsc + '\\')">SHOW</button>'
-    : '<button class="sb-hide-btn" onclick="event.stopPropagation();hideSession(\\'' + fsEsc + '\\')">HIDE</button>';
+    ? '<button class="sb-hide-btn" data-sb-hide-action="show">SHOW</button>'
+    : '<button class="sb-hide-btn" data-sb-hide-action="hide">HIDE</button>';
   if (windows.length > 0) {
     const firstWin = windows[0];
-    const fwEsc = esc(firstWin.name).replace(/'/g, "\\\\'");
-    html += '<div class="sb-session-header" onclick="openTab(\\'' + fsEsc + '\\',' + firstWin.index + ',\\'' + fwEsc + '\\')" style="cursor:pointer">' + esc(s.name)
+    html += '<div class="sb-session-header" data-widx="' + firstWin.index + '" data-name="' + escAttr(firstWin.name) + '" style="cursor:pointer">' + esc(s.name)
       + (s.attached ? ' <span class="sb-badge">attached</span>' : '') + hideBtn + '</div>';
   } else {
     html += '<div class="sb-session-header">' + esc(s.name)
@@ -4907,9 +5750,7 @@ function renderSidebarSession(s, activeTab, isHidden) {
     const ageHtml = '<div class="sb-activity" data-wid="' + wid_age + '">' + age + '</div>';
     const wid = esc(s.name) + ':' + w.index;
     const isActive = activeTab && activeTab.session === s.name && activeTab.windowIndex === w.index;
-    const sEsc = esc(s.name).replace(/'/g, "\\\\'");
-    const wEsc = esc(w.name).replace(/'/g, "\\\\'");
-    html += '<div class="sb-win' + (isActive ? ' active' : '') + '" draggable="true" data-session="' + esc(s.name) + '" data-widx="' + w.index + '" onclick="openTab(\\'' + sEsc + '\\',' + w.index + ',\\'' + wEsc + '\\')">'
+    html += '<div class="sb-win' + (isActive ? ' active' : '') + '" draggable="true" data-session="' + escAttr(s.name) + '" data-widx="' + w.index + '" data-name="' + escAttr(w.name) + '">'
       + '<div class="sb-win-dot ' + dotClass + '" data-wid="' + wid + '"></div>'
       + '<div class="sb-win-info">'
       + '<div class="sb-win-name">' + esc(w.name) + '</div>'
@@ -4918,7 +5759,7 @@ function renderSidebarSession(s, activeTab, isHidden) {
       + (_sidebarExpanded && w.is_cc ? '<div class="sb-perm' + (w.cc_perm_mode && /dangerously|skip|bypass/i.test(w.cc_perm_mode) ? ' danger' : '') + '" data-wid="' + wid + '">' + (w.cc_perm_mode ? esc(w.cc_perm_mode) : '') + '</div>' : '')
       + '</div>'
       + ageHtml + ctxHtml
-      + '<button class="sb-win-detail-btn" onclick="event.stopPropagation();openWD(\\'' + sEsc + '\\',' + w.index + ')" title="Details">&#8942;</button>'
+      + '<button class="sb-win-detail-btn" title="Details">&#8942;</button>'
       + '</div>';
   }
   html += '</div>';
@@ -4930,6 +5771,29 @@ function openTab(session, windowIndex, windowName) {
   createTab(session, windowIndex, windowName);
 }
 
+// Event delegation for session list clicks — rows carry their target in data-*
+document.getElementById('sidebar-content').addEventListener('click', function(e) {
+  if (_sidebarView !== 'sessions') return;
+  if (e.target.closest('.sb-hidden-header')) {
+    _hiddenExpanded = !_hiddenExpanded;
+    renderSidebar();
+    return;
+  }
+  const hideBtn = e.target.closest('.sb-hide-btn');
+  if (hideBtn) {
+    const name = hideBtn.closest('.sb-session').dataset.session;
+    if (hideBtn.dataset.sbHideAction === 'hide') hideSession(name);
+    else unhideSession(name);
+    return;
+  }
+  const row = e.target.closest('.sb-win, .sb-session-header[data-widx]');
+  if (!row) return;
+  const session = row.closest('.sb-session').dataset.session;
+  const widx = parseInt(row.dataset.widx);
+  if (e.target.closest('.sb-win-detail-btn')) openWD(session, widx);
+  else openTab(session, widx, row.dataset.name);
+});
+
 // === Sidebar drag reorder ===
 (function() {
   const sbContent = document.getElementById('sidebar-content');
@@ -5188,8 +6052,65 @@ document.getElementById('wd-rename-input').addEventListener('keydown', e => {
 // === Dashboard ===
 async function loadDashboard() {
   try {
-    const r = await fetch('/api/dashboard');
-    _dashboardData = await r.json();
+    const headers = _dashboardEtag && _dashboardData ? {'If-None-Match': _dashboardEtag} : {};
+    const r = await fetch('/api/dashboard', {headers});
+    if (r.status !== 304) {
+      _dashboardData = await r.json();
+      _dashboardEtag = r.headers.get('ETag');
+    }
+    scheduleApplyDashboard();
+  } catch(e) {}
+}
+// Fallback poll, chained so a slow fetch never overlaps the next; stops while hidden
+let _dashPollTimer = null;
+function scheduleDashboardPoll() {
+  clearTimeout(_dashPollTimer);
+  _dashPollTimer = null;
+  if (document.hidden) return;
+  _dashPollTimer = setTimeout(async () => {
+    if (!_dashWs) {
+      openDashboardSocket();
+      await loadDashboard();
+    }
+    scheduleDashboardPoll();
+  }, 3000);
+}
+// Pushed dashboard updates replace the 3s poll while the socket is up
+function openDashboardSocket() {
+  if (_dashWs || !window.WebSocket || Date.now() < _dashWsRetryAt) return;
+  const proto = location.protocol === 'https:' ? 'wss://' : 'ws://';
+  const ws = new WebSocket(proto + location.host + '/ws/dashboard');
+  _dashWs = ws;
+  ws.onmessage = (e) => {
+    try {
+      _dashboardData = JSON.parse(e.data);
+      _dashboardEtag = null;
+      scheduleApplyDashboard();
+    } catch(err) {}
+  };
+  ws.onclose = () => {
+    if (_dashWs !== ws) return; // Closed on purpose
+    _dashWs = null;
+    _dashWsRetryAt = Date.now() + 5000; // polling covers the gap
+  };
+}
+function closeDashboardSocket() {
+  const ws = _dashWs;
+  if (!ws) return;
+  _dashWs = null;
+  ws.close();
+}
+// Sidebar re-renders wait for an idle moment so they don't compete with pane
+// rendering; the timeout bounds the wait on a busy main thread
+const _onIdle = window.requestIdleCallback || (cb => setTimeout(cb, 1));
+let _dashApplyQueued = false;
+function scheduleApplyDashboard() {
+  if (_dashApplyQueued) return;
+  _dashApplyQueued = true;
+  _onIdle(() => { _dashApplyQueued = false; applyDashboard(); }, {timeout: 1000});
+}
+function applyDashboard() {
+  try {
     const dragging = _dragSrcTabId !== null || _sbDragging;
     if (!dragging) {
       if (_sidebarView === 'sessions') renderSidebar();
@@ -5207,7 +6128,7 @@ async function loadDashboard() {
             tab.windowName = win.name;
             if (!dragging) {
               for (const p of panes) {
-                if (p.tabIds.includes(parseInt(tid))) renderPaneTabs(p.id);
+                if (p.tabIds.includes(parseInt(tid))) invalidatePaneTabs(p.id);
               }
             }
           }
@@ -5312,7 +6233,8 @@ async function submitNewWin() {
 // === Input ===
 // Shared textarea setup: auto-resize, Enter/key-forwarding, mobile beforeinput fallback
 function setupTextareaInput(ta, sendFn) {
-  const resize = () => { const max=window.innerHeight*0.4; ta.style.height='auto'; ta.style.height=Math.min(ta.scrollHeight,max)+'px'; ta.style.overflowY=ta.scrollHeight>max?'auto':'hidden'; };
+  // Reading scrollHeight forces layout — once per frame is enough while typing or pasting
+  const resize = rafThrottle(() => { const max=window.innerHeight*0.4; ta.style.height='auto'; ta.style.height=Math.min(ta.scrollHeight,max)+'px'; ta.style.overflowY=ta.scrollHeight>max?'auto':'hidden'; });
   ta.addEventListener('input', resize);
   ta.addEventListener('paste', () => setTimeout(resize, 0));
   let _enterHandled = false, _shift = false;
@@ -5333,7 +6255,8 @@ setupTextareaInput(M, sendGlobal);
 
 // === iOS keyboard ===
 if (window.visualViewport) {
-  const adjust = () => { bar.style.bottom = (window.innerHeight - window.visualViewport.height) + 'px'; };
+  // resize/scroll fire many times per frame while the keyboard animates
+  const adjust = rafThrottle(() => { bar.style.bottom = (window.innerHeight - window.visualViewport.height) + 'px'; });
   window.visualViewport.addEventListener('resize', adjust);
   window.visualViewport.addEventListener('scroll', adjust);
 }
@@ -5501,7 +6424,8 @@ async function init() {
       if (activeWin) createTab(sess.name, activeWin.index, activeWin.name);
     }
   }
-  setInterval(() => { if (!document.hidden) loadDashboard(); }, 3000);
+  openDashboardSocket();
+  scheduleDashboardPoll();
   // Update activity ages in-place every 30s (between dashboard polls)
   setInterval(() => { if (!document.hidden) updateSidebarAges(); }, 30000);
 }
@@ -5510,10 +6434,15 @@ document.addEventListener('visibilitychange', () => {
   if (document.hidden) {
     // Stop all tab polls when page is hidden
     for (const tid in tabStates) stopTabPolling(parseInt(tid));
+    closeOutputSocket();
+    closeDashboardSocket();
+    scheduleDashboardPoll(); // clears the pending poll
   } else {
     // Resume visible tab polls + refresh dashboard
     updatePolling();
     loadDashboard();
+    openDashboardSocket();
+    scheduleDashboardPoll();
   }
 });
 window.addEventListener('beforeunload', function(e) {
@@ -5528,19 +6457,261 @@ init();
 
 
 
+# --- Static assets ---
+# The inline <style> and main <script> are split out of HTML at import into
+# content-hashed files served as immutable, so repeat loads only fetch the small
+# page shell. Everything is compressed once here (gzip, plus brotli when the
+# module is installed); responses hand back stored bytes.
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# marked comes from the CDN unless a copy sits at static/marked.umd.min.js —
+# then it's served from here like the other assets (no third-party fetch, works offline)
+MARKED_CDN_URL = "https://cdn.jsdelivr.net/npm/marked/lib/marked.umd.min.js"
+MARKED_LOCAL = Path(__file__).resolve().parent / "static" / "marked.umd.min.js"
+
+
+def _precompress(body: bytes) -> tuple:
+    """(body, gzip, brotli or None)."""
+    return body, gzip.compress(body, 9), brotli.compress(body, quality=11) if brotli else None
+
+
+def _build_assets():
+    """Returns ((html, html_gz, html_br), {name: (body, body_gz, body_br, media_type)})."""
+    page = HTML.replace("__TITLE__", TITLE)
+    assets = {}
+    for open_tag, close_tag, ext, media_type, ref in (
+        ("<style>", "</style>", "css", "text/css; charset=utf-8",
+         '<link rel="stylesheet" href="/static/{}">'),
+        ("<script>", "</script>", "js", "text/javascript; charset=utf-8",
+         '<script src="/static/{}"></script>'),
+    ):
+        start = page.index(open_tag)
+        end = page.index(close_tag, start)
+        body = page[start + len(open_tag):end].encode()
+        name = f"app.{hashlib.blake2b(body, digest_size=6).hexdigest()}.{ext}"
+        assets[name] = (*_precompress(body), media_type)
+        page = page[:start] + ref.format(name) + page[end + len(close_tag):]
+    if MARKED_LOCAL.is_file():
+        body = MARKED_LOCAL.read_bytes()
+        name = f"marked.{hashlib.blake2b(body, digest_size=6).hexdigest()}.js"
+        assets[name] = (*_precompress(body), "text/javascript; charset=utf-8")
+        page = page.replace(MARKED_CDN_URL, f"/static/{name}")
+    return _precompress(page.encode()), assets
+
+
+_INDEX_HTML, _ASSETS = _build_assets()  # invariant for the process lifetime
+# The shell changes only when the asset hashes in it do — browsers revalidate it
+# on every load and get an empty 304 until the server is updated
+_INDEX_ETAG = '"' + hashlib.blake2b(_INDEX_HTML[0], digest_size=16).hexdigest() + '"'
+_INDEX_HEADERS = {"ETag": _INDEX_ETAG, "Cache-Control": "no-cache"}
+
+
+def _encoded_response(request: Request, body: bytes, body_gz: bytes, body_br, media_type: str,
+                      headers: dict) -> Response:
+    """Serve precompressed bytes in the best encoding the client accepts."""
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    accepted = {e.split(";", 1)[0].strip() for e in request.headers.get("accept-encoding", "").split(",")}
+    if body_br is not None and "br" in accepted:
+        return Response(body_br, media_type=media_type, headers={**headers, "Content-Encoding": "br"})
+    if "gzip" in accepted:
+        return Response(body_gz, media_type=media_type, headers={**headers, "Content-Encoding": "gzip"})
+    return Response(body, media_type=media_type, headers=headers)
+
+
 @app.get("/")
-async def index():
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, ensure_session)
-    html = HTML.replace("__TITLE__", TITLE)
-    return HTMLResponse(html, headers={"Cache-Control": "no-store"})
+async def index(request: Request):
+    if time.time() - _session_checked > SESSION_CHECK_TTL:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, ensure_session)
+    if request.headers.get("if-none-match") == _INDEX_ETAG:
+        return Response(status_code=304, headers={**_INDEX_HEADERS, "Vary": "Accept-Encoding"})
+    return _encoded_response(request, *_INDEX_HTML, "text/html; charset=utf-8", _INDEX_HEADERS)
+
+
+@app.get("/static/{name}")
+async def static_asset(request: Request, name: str):
+    asset = _ASSETS.get(name)
+    if asset is None:
+        return Response(status_code=404)
+    return _encoded_response(request, *asset, {"Cache-Control": ASSET_CACHE_CONTROL})
 
 
 @app.get("/api/output")
-async def api_output(session: str = None, window: int = None):
-    loop = asyncio.get_running_loop()
-    output = await loop.run_in_executor(None, get_output, session, window)
-    return JSONResponse({"output": output})
+async def api_output(request: Request, session: str = None, window: int = None):
+    output = await _output_snapshot(session, window)
+    # Content hash as ETag — a poller that already has this text gets an empty 304
+    etag = _output_etag(output)
+    headers = {"ETag": etag, "Cache-Control": "no-store"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"output": output}, headers=headers)
+
+
+@app.post("/api/output/batch")
+async def api_output_batch(body: dict):
+    """Several panes in one round trip. {"targets": [{session, window, etag}]} →
+    {"results": [{etag, output}]}. "output" is left out where the etag still matches,
+    and replaced by {"ops": [...]} line diffs when the client's etag is a recent snapshot."""
+    targets = body.get("targets") or []
+    # Same types /api/output's query params take — session and window become cache keys
+    if not isinstance(targets, list) or not all(
+            isinstance(t, dict) and isinstance(t.get("session"), (str, type(None)))
+            and isinstance(t.get("window"), (int, type(None))) and not isinstance(t.get("window"), bool)
+            for t in targets):
+        return JSONResponse({"ok": False, "error": "targets must be [{session: str, window: int}]"},
+                            status_code=422)
+    outputs = await asyncio.gather(*[_output_snapshot(t.get("session"), t.get("window")) for t in targets])
+    results = []
+    for t, output in zip(targets, outputs):
+        etag = _output_etag(output)
+        client_etag = t.get("etag")
+        if not isinstance(client_etag, str):
+            client_etag = None  # anything else gets a full snapshot
+        if client_etag == etag:
+            results.append({"etag": etag})
+            continue
+        lines = output.split("\n")
+        key = (t.get("session") or _current_session, t.get("window"))
+        recent = _output_recent.setdefault(key, collections.OrderedDict())
+        _output_recent.move_to_end(key)
+        while len(_output_recent) > OUTPUT_RECENT_PANES:
+            _output_recent.popitem(last=False)
+        base = recent.get(client_etag)
+        recent[etag] = lines
+        recent.move_to_end(etag)
+        while len(recent) > OUTPUT_RECENT_MAX:
+            recent.popitem(last=False)
+        if base is not None:
+            results.append({"etag": etag, "ops": _diff_lines(base, lines)})
+        else:
+            results.append({"etag": etag, "output": output})
+    return JSONResponse({"results": results}, headers={"Cache-Control": "no-store"})
+
+
+async def _ws_accept(ws: WebSocket) -> bool:
+    """Accept a WebSocket handshake unless it comes from another site's page.
+    Browsers don't apply the same-origin policy to WebSockets, so without this any
+    page the user visits could subscribe to their panes. Clients that send no
+    Origin (scripts, curl) are not browsers and are let through."""
+    origin = ws.headers.get("origin")
+    if origin is not None and urllib.parse.urlsplit(origin).netloc.lower() != ws.headers.get("host", "").lower():
+        await ws.close(code=1008)
+        return False
+    await ws.accept()
+    return True
+
+
+@app.websocket("/ws/output")
+async def ws_output(ws: WebSocket, session: str = None, window: int = None):
+    """Push pane output: one {"full": text} snapshot, then {"ops": [...]} line diffs."""
+    if not await _ws_accept(ws):
+        return
+    target = (session or _current_session, window)
+    q = _output_subscribe(target)
+    try:
+        await _ws_send_queue(ws, q)
+    finally:
+        _output_unsubscribe(target, q)
+
+
+@app.websocket("/ws/outputs")
+async def ws_outputs(ws: WebSocket):
+    """Every pane a page shows, over one socket. The client sends
+    {"sub": id, "session", "window"} and {"unsub": id}; pushes are /ws/output's
+    messages with the subscription's "id" added."""
+    if not await _ws_accept(ws):
+        return
+    q = asyncio.Queue()
+    subs = {}  # subscription id → (target, _TaggedQueue)
+
+    def on_text(text):
+        try:
+            msg = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(msg, dict):
+            return
+        old = subs.pop(msg.get("unsub", msg.get("sub")), None)
+        if old is not None:
+            _output_unsubscribe(*old)
+        if "sub" in msg:
+            target = (msg.get("session") or _current_session, msg.get("window"))
+            tq = _TaggedQueue(q, msg["sub"])
+            subs[msg["sub"]] = (target, tq)
+            _output_subscribe(target, tq)
+    try:
+        await _ws_send_queue(ws, q, on_text)
+    finally:
+        for target, tq in subs.values():
+            _output_unsubscribe(target, tq)
+
+
+@app.websocket("/ws/dashboard")
+async def ws_dashboard(ws: WebSocket):
+    """Push the /api/dashboard payload whenever it changes."""
+    if not await _ws_accept(ws):
+        return
+    q = _dashboard_subscribe()
+    try:
+        await _ws_send_queue(ws, q)
+    finally:
+        _dashboard_subs.discard(q)  # pump exits on its next tick once none are left
+
+
+async def _ws_send_queue(ws: WebSocket, q: asyncio.Queue, on_text=None):
+    """Send queued messages (dicts, or already-serialized text) until the client
+    goes away. Text the client sends goes to on_text, or is dropped without one."""
+    # Watch for disconnect while waiting on the queue — an idle pane never sends
+    reader = asyncio.ensure_future(ws.receive())
+    try:
+        while True:
+            getter = asyncio.ensure_future(q.get())
+            done, _ = await asyncio.wait({getter, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                msg = getter.result()
+                await ws.send_text(msg if isinstance(msg, str) else _json_text(msg))
+            else:
+                getter.cancel()
+            if reader in done:
+                message = reader.result()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if on_text is not None and message.get("text") is not None:
+                    on_text(message["text"])
+                reader = asyncio.ensure_future(ws.receive())
+    except Exception:
+        pass
+    finally:
+        reader.cancel()
+
+
+@app.get("/api/stream")
+async def api_stream(request: Request, session: str = None, window: int = None):
+    """Server-sent events for HTTP-only consumers: {"output": text} whenever the pane
+    changes, fed by the same shared capture loop as /ws/output."""
+    target = (session or _current_session, window)
+    q = _output_subscribe(target)
+
+    async def events():
+        sent = None
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(q.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"  # keepalive through proxies
+                    continue
+                # Full text, not diff ops — the hub's latest snapshot (queued diffs collapse)
+                output = "\n".join(_output_last.get(target) or [])
+                if output != sent:
+                    sent = output
+                    yield f"data: {_json_text({'output': output})}\n\n"
+        finally:
+            _output_unsubscribe(target, q)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.post("/api/send")
@@ -5555,6 +6726,7 @@ async def api_send(body: dict):
         if not ok:
             return JSONResponse({"ok": False, "error": "tmux send failed"}, status_code=500)
         s = session or _current_session
+        _invalidate_output((s, window))  # next poll should see the echo
         w = window if window is not None else 0
         key = f"{s}:{w}"
         _last_interaction[key] = time.time()
@@ -5569,22 +6741,26 @@ async def api_send(body: dict):
 
 
 @app.get("/api/key/{key}")
-async def api_key(key: str, session: str = None, window: int = None):
-    ALLOWED = {"C-c", "C-d", "C-l", "C-z", "Up", "Down", "Left", "Right", "Tab", "Enter", "Escape"}
-    if key in ALLOWED:
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, send_special, key, session, window)
-        s = session or _current_session
-        w = window if window is not None else 0
-        _last_interaction[f"{s}:{w}"] = time.time()
+async def api_key(key: SpecialKey, session: str = None, window: int = None):
+    # Unknown keys are rejected with a 422 by FastAPI before this runs
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, send_special, key.value, session, window)
+    s = session or _current_session
+    _invalidate_output((s, window))
+    w = window if window is not None else 0
+    _last_interaction[f"{s}:{w}"] = time.time()
     return JSONResponse({"ok": True})
 
 
 @app.get("/api/dashboard")
-async def api_dashboard():
-    loop = asyncio.get_running_loop()
-    data = await loop.run_in_executor(None, get_dashboard)
-    return JSONResponse(data)
+async def api_dashboard(request: Request):
+    text = await _dashboard_text()
+    # Idle sessions give the same payload poll after poll — answer those with a 304
+    etag = '"' + hashlib.blake2b(text.encode(), digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-store"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(text, media_type="application/json", headers=headers)
 
 
 @app.post("/api/notify")
@@ -5616,6 +6792,7 @@ async def api_new_window(body: dict = {}):
         cwd=body.get("cwd"),
         commands=body.get("commands"),
     ))
+    _invalidate_windows()
     return JSONResponse({"ok": True, "index": idx})
 
 
@@ -5623,6 +6800,7 @@ async def api_new_window(body: dict = {}):
 async def api_select_window(index: int):
     loop = asyncio.get_running_loop()
     await loop.run_in_executor(None, select_window, index)
+    _invalidate_windows()
     return JSONResponse({"ok": True})
 
 
@@ -5632,11 +6810,12 @@ async def api_rename_current_window(body: dict):
     if name:
         def _do():
             target = _current_session
-            _run(["tmux", "rename-window", "-t", target, name])
-            _run(["tmux", "set-window-option", "-t", target, "allow-rename", "off"])
-            _run(["tmux", "set-window-option", "-t", target, "automatic-rename", "off"])
+            _run(["tmux", "rename-window", "-t", target, name, ";",
+                  "set-window-option", "-t", target, "allow-rename", "off", ";",
+                  "set-window-option", "-t", target, "automatic-rename", "off"])
         loop = asyncio.get_running_loop()
         await loop.run_in_executor(None, _do)
+        _invalidate_windows()
     return JSONResponse({"ok": True})
 
 
@@ -5644,10 +6823,11 @@ async def api_rename_current_window(body: dict):
 async def api_reset_window_name():
     def _do():
         target = _current_session
-        _run(["tmux", "set-window-option", "-t", target, "automatic-rename", "on"])
-        _run(["tmux", "set-window-option", "-t", target, "allow-rename", "on"])
+        _run(["tmux", "set-window-option", "-t", target, "automatic-rename", "on", ";",
+              "set-window-option", "-t", target, "allow-rename", "on"])
     loop = asyncio.get_running_loop()
     await loop.run_in_executor(None, _do)
+    _invalidate_windows()
     return JSONResponse({"ok": True})
 
 
@@ -5658,11 +6838,12 @@ async def api_rename_window(index: int, body: dict):
     if name:
         def _do():
             target = f"{session}:{index}"
-            _run(["tmux", "rename-window", "-t", target, name])
-            _run(["tmux", "set-window-option", "-t", target, "allow-rename", "off"])
-            _run(["tmux", "set-window-option", "-t", target, "automatic-rename", "off"])
+            _run(["tmux", "rename-window", "-t", target, name, ";",
+                  "set-window-option", "-t", target, "allow-rename", "off", ";",
+                  "set-window-option", "-t", target, "automatic-rename", "off"])
         loop = asyncio.get_running_loop()
         await loop.run_in_executor(None, _do)
+        _invalidate_windows()
     return JSONResponse({"ok": True})
 
 
@@ -5671,6 +6852,7 @@ async def api_close_window(index: int, session: str = None):
     sess = session or _current_session
     loop = asyncio.get_running_loop()
     await loop.run_in_executor(None, _run, ["tmux", "kill-window", "-t", f"{sess}:{index}"])
+    _invalidate_windows()
     return JSONResponse({"ok": True})
 
 
@@ -5734,6 +6916,7 @@ async def api_rename_session(name: str, body: dict):
     global _current_session
     if _current_session == name:
         _current_session = new_name
+    _invalidate_windows()
     return JSONResponse({"ok": True})
 
 
@@ -5936,4 +7119,6 @@ if __name__ == "__main__":
         print("  macOS:  brew install tmux")
         print("  Ubuntu: sudo apt install tmux")
         sys.exit(1)
-    uvicorn.run(app, host=HOST, port=PORT)
+    # loop/http stay "auto": uvicorn picks uvloop + httptools when installed
+    # (uvicorn[standard]). No access log — it's one formatted line per poll.
+    uvicorn.run(app, host=HOST, port=PORT, access_log=False)